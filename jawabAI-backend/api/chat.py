@@ -1,76 +1,275 @@
-from processing.embedder import embed
-from retrieval.pinecone_client import query
-from llm.generator import generate_answer
-from storage.redis_client import redis_client
+import logging
+import asyncio
+import json
+from typing import Optional
+from processing.query_batcher import query_batcher
+from retrieval.fanout import query_documents, ranking_score
+from retrieval.reranker import reranker
+from llm.generator import generate_answer, stream_answer
+from llm.context import assemble_context
 from utils.cache_helper import cache_helper
+from storage.chunk_store import fetch_chunk_texts
+from storage.page_manifest import ahas_page_manifests
+from api.fields import answer_from_fields
+from utils.metrics import timed
+from utils.single_flight import SingleFlight
+from config.settings import CHAT_TOP_K, RERANKER_CANDIDATES, CHAT_LEASE_MS, CHAT_MAX_DOCUMENTS
 
-def chat(payload):
-    document_id = payload["document_id"]
+logger = logging.getLogger(__name__)
+
+# A burst of the same question waits for one LLM call instead of making many
+chat_flight = SingleFlight("chat", CHAT_LEASE_MS)
+
+def validate_chat_payload(payload) -> Optional[str]:
+    """The reason a chat payload is invalid (the API answers 400), or None"""
+    if not isinstance(payload.get("question"), str) or not payload["question"].strip():
+        return "question must be a non-empty string"
+    if "document_ids" in payload:
+        document_ids = payload["document_ids"]
+        if not isinstance(document_ids, list) or not document_ids:
+            return "document_ids must be a non-empty list of document ids"
+        if not all(isinstance(document_id, str) and document_id for document_id in document_ids):
+            return "document_ids must contain only non-empty strings"
+        if len(set(document_ids)) > CHAT_MAX_DOCUMENTS:
+            return f"At most {CHAT_MAX_DOCUMENTS} documents per chat"
+    elif not isinstance(payload.get("document_id"), str) or not payload["document_id"]:
+        return "document_id (or document_ids) is required"
+    return None
+
+async def prepare_chat(payload):
+    """
+    Shared steps for /chat and /chat/stream: status check, caches, retrieval
+
+    The payload names one document ("document_id") or several
+    ("document_ids", e.g. a whole course pack) whose namespaces are
+    queried concurrently. Returns {"response": ...} when the request is
+    answered without the LLM (not ready / cache hit / invoice field), otherwise the
+    retrieval context for generation.
+    """
+    error = validate_chat_payload(payload)
+    if error:
+        return {"response": {"error": error}}
+
+    document_ids = list(dict.fromkeys(payload.get("document_ids") or [payload["document_id"]]))
     use_case = payload.get("use_case", "study")
     question = payload["question"]
+    scope = cache_helper.get_cache_scope(document_ids)
+
+    # Step 1 + 2: Document status and cached answer in one round trip
+    statuses, cached_response = await cache_helper.get_chat_state(scope, question, document_ids)
+    pending = [document_id for document_id, status in zip(document_ids, statuses) if status != "DONE"]
+    # A document whose new revision is still queued/processing keeps
+    # answering from the previous one until the revision is DONE
+    if pending and not await ahas_page_manifests(pending):
+        return {"response": {"error": "Document not ready"}}
 
-    # Step 1: Check document status
-    status = redis_client.get(f"ingest:{document_id}")
-    if status != "DONE":
-        return {"error": "Document not ready"}
-    
-    # Step 2: Check if this query was already answered (cache)
-    cached_response = cache_helper.get_cached_query_response(document_id, question)
+    # Step 2: This query was already answered (cache)
     if cached_response:
-        print(f"✨ Returning cached answer for: {question[:50]}...")
+        logger.debug("✨ Returning cached answer for: %.50s...", question)
         cached_response["cached"] = True
-        return cached_response
+        return {"response": cached_response}
+
+    # Step 2a: Invoice field questions are answered from the fields extracted at ingest
+    if use_case == "invoice" and len(document_ids) == 1:
+        structured_response = await answer_from_fields(document_ids[0], question)
+        if structured_response:
+            return {"response": structured_response}
+
+    with timed("query_embed"):
+        query_vec = await query_batcher.embed(question)
 
-    namespace = f"{use_case}:{document_id}"
-    query_vec = embed([question])[0]
+    # Step 2b: A paraphrase of an answered question reuses its answer
+    similar_response = await cache_helper.find_similar_query_response(scope, query_vec)
+    if similar_response:
+        similar_response["cached"] = True
+        return {"response": similar_response}
 
-    results = query(query_vec, namespace, document_id=document_id)
-    
-    contexts = []
-    sources = []
+    # Dense + BM25 (hybrid) retrieval; a wider candidate pool when reranking
+    top_k = max(CHAT_TOP_K, RERANKER_CANDIDATES) if reranker else CHAT_TOP_K
+    with timed("retrieve"):
+        matches = await query_documents(query_vec, use_case, document_ids, top_k=top_k, question=question)
 
-    # Handle Pinecone QueryResponse - results.matches is a list of Match objects
-    matches = results.matches if hasattr(results, 'matches') else results.get("matches", [])
-    
+    # Chunk text is stored once per document and referenced by vector id
+    # (older documents still carry it in metadata)
+    with timed("redis"):
+        stored = await asyncio.gather(*(
+            fetch_chunk_texts(document_id, [m["id"] for m in matches if m["document_id"] == document_id])
+            for document_id in document_ids
+        ))
+    stored_texts = {k: v for texts in stored for k, v in texts.items()}
     for match in matches:
-        # Handle both object attributes and dict access
-        if hasattr(match, 'metadata'):
-            metadata = match.metadata or {}
-        else:
-            metadata = match.get("metadata", {}) or {}
+        match["text"] = stored_texts.get(match["id"]) or match["metadata"].get("text", "")
 
-        text = metadata.get("text", "") if isinstance(metadata, dict) else getattr(metadata, "text", "")
-        page = metadata.get("page", "N/A") if isinstance(metadata, dict) else getattr(metadata, "page", "N/A")
-        source = metadata.get("source", "document") if isinstance(metadata, dict) else getattr(metadata, "source", "document")
-        score = match.score if hasattr(match, 'score') else match.get("score", 0)
+    if reranker:
+        with timed("rerank"):
+            matches = (await reranker.arerank(question, matches))[:CHAT_TOP_K]
 
-        contexts.append(f"[Page {page}] {text}")
+    pieces = []
 
-        sources.append({
+    for match in matches:
+        metadata = match["metadata"]
+        page = metadata.get("page", "N/A")
+        source = metadata.get("source", "document")
+
+        # Pinecone returns numeric metadata as floats
+        page_num = int(page) if isinstance(page, (int, float)) else 0
+        # score: cosine similarity (reranker score when reranking, None for
+        # BM25-only matches); fused_score: the hybrid rank-fusion score
+        source_info = {
             "page": page,
             "source": source,
-            "score": score
+            "score": match["score"]
+        }
+        if "fused_score" in match:
+            source_info["fused_score"] = match["fused_score"]
+        if len(document_ids) > 1:
+            source_info["document_id"] = match["document_id"]
+        pieces.append({
+            "text": match["text"],
+            "score": ranking_score(match),
+            "page": page_num,
+            "page_end": int(metadata.get("page_end", page_num)),
+            "document_id": match["document_id"],
+            "sources": [source_info]
         })
 
-    context = "\n\n".join(contexts)
+    # Merge overlapping chunks, drop near-duplicates, fit the token budget;
+    # sources are only the chunks the answer could actually have used
+    with timed("context"):
+        context, context_stats, sources = assemble_context(pieces)
+    sources.sort(key=ranking_score, reverse=True)
+    logger.debug("📦 Context: %d tokens (saved %d)", context_stats["context_tokens"], context_stats["saved_tokens"])
+
+    return {
+        "scope": scope,
+        "document_ids": document_ids,
+        "use_case": use_case,
+        "question": question,
+        "query_vec": query_vec,
+        "context": context,
+        "context_stats": context_stats,
+        "sources": sources
+    }
+
+async def chat(payload):
+    prepared = await prepare_chat(payload)
+    if "response" in prepared:
+        return prepared["response"]
+
+    # Step 3-5: Generate and cache the answer, once for identical questions in flight
+    scope, question = prepared["scope"], prepared["question"]
+    response, shared = await chat_flight.do(
+        cache_helper.get_query_cache_key(scope, question),
+        lambda: generate_response(prepared),
+        lambda: cache_helper.get_cached_query_response(scope, question)
+    )
+    if shared:
+        logger.debug("🤝 Shared in-flight answer for: %.50s...", question)
+        return {**response, "cached": True}
+    return response
+
+async def generate_response(prepared):
+    question = prepared["question"]
+    sources = prepared["sources"]
 
     # Step 3: Generate answer (cache miss - need to process)
-    print(f"🔍 Processing new query: {question[:50]}...")
-    answer = generate_answer(
+    logger.debug("🔍 Processing new query: %.50s...", question)
+    answer = await generate_answer(
         question=question,
-        context=context,
+        context=prepared["context"],
         sources=sources,
-        use_case=use_case
+        use_case=prepared["use_case"]
     )
 
     # Step 4: Prepare response
     response = {
         "answer": answer,
         "sources": sources,
+        "context_stats": prepared["context_stats"],
         "cached": False
     }
-    
+
     # Step 5: Cache the response for future queries
-    cache_helper.cache_query_response(document_id, question, response)
+    await cache_helper.cache_query_response(
+        prepared["scope"], question, response, query_vec=prepared["query_vec"],
+        document_ids=prepared["document_ids"]
+    )
 
     return response
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def replay_events(response: dict) -> list[str]:
+    """A finished (cached or shared) answer as sources, one token and done"""
+    return [
+        sse_event("sources", response.get("sources", [])),
+        sse_event("token", {"text": response.get("answer", "")}),
+        sse_event("done", {"cached": response.get("cached", True)})
+    ]
+
+async def chat_stream(payload):
+    """
+    Server-Sent Events version of chat
+
+    Events: "sources" (sent first), "token" ({"text"} per model chunk),
+    "done" ({"cached"}) or "error" ({"error"}). The full answer is written
+    to the query cache once the stream completes.
+    """
+    try:
+        prepared = await prepare_chat(payload)
+    except Exception as e:
+        yield sse_event("error", {"error": str(e)})
+        return
+
+    if "response" in prepared:
+        response = prepared["response"]
+        if "error" in response:
+            yield sse_event("error", response)
+            return
+        for event in replay_events(response):
+            yield event
+        return
+
+    scope, question = prepared["scope"], prepared["question"]
+    sources = prepared["sources"]
+
+    # The same question already streaming for another request - send its
+    # answer once cached (or stream our own if that request fails)
+    key = cache_helper.get_query_cache_key(scope, question)
+    token = await chat_flight.acquire(key)
+    if token is None:
+        shared = await chat_flight.wait(key, lambda: cache_helper.get_cached_query_response(scope, question))
+        if shared:
+            for event in replay_events({**shared, "cached": True}):
+                yield event
+            return
+
+    try:
+        yield sse_event("sources", sources)
+
+        logger.debug("🔍 Streaming new query: %.50s...", question)
+        parts = []
+        try:
+            async for text in stream_answer(question, prepared["context"], prepared["use_case"]):
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+            return
+
+        response = {
+            "answer": "".join(parts).strip(),
+            "sources": sources,
+            "context_stats": prepared["context_stats"],
+            "cached": False
+        }
+        await cache_helper.cache_query_response(
+            scope, question, response, query_vec=prepared["query_vec"],
+            document_ids=prepared["document_ids"]
+        )
+        yield sse_event("done", {"cached": False})
+    finally:
+        if token is not None:
+            await chat_flight.release(key, token)
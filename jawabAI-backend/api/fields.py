@@ -0,0 +1,37 @@
+from storage.field_store import fetch_invoice_fields
+from processing.invoice_fields import requested_fields, format_fields
+from utils.metrics import record_cache
+from config.settings import INVOICE_SHORTCUT_MAX_WORDS
+
+async def document_fields(document_id: str):
+    """Structured invoice fields extracted at ingest time"""
+    fields = await fetch_invoice_fields(document_id)
+    if fields is None:
+        return {"document_id": document_id, "error": "No invoice fields for this document"}
+    return {"document_id": document_id, "fields": fields}
+
+async def answer_from_fields(document_id: str, question: str):
+    """
+    Chat shortcut for invoices: a short question about known fields
+    ("what is the total?") is answered from the extracted fields without
+    embedding, retrieval or an LLM call. Returns None to fall through to
+    the normal path (longer question, unknown or missing field).
+    """
+    if len(question.split()) > INVOICE_SHORTCUT_MAX_WORDS:
+        return None
+    names = requested_fields(question)
+    if not names:
+        return None
+    fields = await fetch_invoice_fields(document_id)
+    answered = bool(fields) and all(name in fields for name in names)
+    record_cache("invoice_fields", answered)
+    if not answered:
+        return None
+
+    pages = sorted({fields[name]["page"] for name in names if fields[name].get("page")})
+    return {
+        "answer": format_fields(fields, names),
+        "sources": [{"page": page, "source": "invoice fields", "score": 1.0} for page in pages],
+        "structured": True,
+        "cached": False
+    }
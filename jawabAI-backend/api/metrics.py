@@ -0,0 +1,26 @@
+from ingestion.job_queue import aqueue_depths
+from processing.query_batcher import query_batcher
+from utils.cache_helper import cache_helper
+from utils.ttl_cache import local_cache_stats
+from utils.metrics import set_queue_depth, set_local_cache_size, render_metrics
+
+async def collect_metrics() -> bytes:
+    """
+    Prometheus exposition for /metrics
+    Queue depths and in-process cache sizes are read at scrape time;
+    timers and cache counters accumulate as requests run.
+    """
+    try:
+        for queue, depth in (await aqueue_depths()).items():
+            set_queue_depth(queue, depth)
+    except Exception:
+        # Redis being down should not take the metrics endpoint with it
+        pass
+    set_queue_depth("query_embed", query_batcher.depth())
+    for cache, stats in local_cache_stats().items():
+        set_local_cache_size(cache, stats["entries"], stats["bytes"])
+    return render_metrics()
+
+def cache_stats() -> dict:
+    """Hit rate per tier (in-process, Redis) and each in-process cache's size"""
+    return {"tiers": cache_helper.tier_stats(), "local": local_cache_stats()}
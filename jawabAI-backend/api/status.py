@@ -0,0 +1,14 @@
+from storage.redis_client import async_redis_client
+
+async def document_status(document_id: str):
+    """
+    Ingestion status for a document
+    The status key holds QUEUED, PROCESSING[:percent], DONE or FAILED.
+    """
+    raw = await async_redis_client.get(f"ingest:{document_id}")
+    if raw is None:
+        return {"document_id": document_id, "status": "UNKNOWN", "progress": 0}
+
+    status, _, percent = raw.partition(":")
+    progress = 100 if status == "DONE" else int(percent or 0)
+    return {"document_id": document_id, "status": status, "progress": progress}
@@ -1,59 +1,162 @@
+import logging
+import asyncio
 import uuid
+from io import BytesIO
 from fastapi import UploadFile, BackgroundTasks
-from storage.cloudinary_client import upload_file
+from storage.cloudinary_client import aupload_file
+from storage.redis_client import async_redis_client
+from storage.spool import spool_upload
 from ingestion.pipeline import ingest_pipeline
+from ingestion.job_queue import stage_ingest_job
+from api.status import document_status
 from utils.cache_helper import cache_helper
-from storage.redis_client import redis_client
+from utils.cache_invalidation import stage_invalidation
+from utils.single_flight import SingleFlight
+from config.settings import INGEST_MODE, UPLOAD_LEASE_MS
 
-def upload_document(
+logger = logging.getLogger(__name__)
+
+# Keep references to in-flight archival uploads so they are not garbage collected
+_archive_tasks = set()
+
+# Concurrent uploads of the same file share one upload + ingestion
+upload_flight = SingleFlight("upload", UPLOAD_LEASE_MS)
+
+async def archive_upload(file_content: bytes, folder: str, document_id: str):
+    """
+    Archive the original PDF to Cloudinary off the critical path
+    The URL is recorded under doc:url:{document_id} for workers that
+    cannot see this host's spool directory.
+    """
+    try:
+        url = await aupload_file(BytesIO(file_content), folder)
+        await async_redis_client.set(f"doc:url:{document_id}", url)
+    except Exception as e:
+        logger.warning("⚠️ Archival upload failed for %s: %s", document_id, e)
+
+async def upload_document(
     file: UploadFile,
     use_case: str,
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    document_id: str = None
 ):
-    print("Received a file upload request.")
+    """
+    Upload a new document, or with document_id a new revision of an
+    existing one (re-ingested incrementally under the same id, so chats
+    keep working and only changed pages are embedded again)
+    """
+    logger.debug("Received a file upload request.")
+    revision = document_id is not None
+    
+    if revision:
+        status = await async_redis_client.get(f"ingest:{document_id}")
+        if status is None:
+            return {"document_id": document_id, "error": "Unknown document"}
+        if status not in ("DONE", "FAILED"):
+            return {"document_id": document_id, "error": "Document is still processing"}
     
     # Step 1: Read file content to generate hash
-    file_content = file.file.read()
-    file.file.seek(0)  # Reset file pointer for later use
+    file_content = await file.read()
     
     # Step 2: Generate hash of PDF content
     file_hash = cache_helper.get_file_hash(file_content)
-    print(f"📝 File hash: {file_hash[:16]}...")
-    
-    # Step 3: Check if this PDF was already processed for this use_case
-    cached_document_id = cache_helper.get_cached_document_id(file_hash, use_case)
-    
-    if cached_document_id:
-        # PDF already processed for this use_case - return existing document_id
-        print(f"✨ Using cached document for {use_case}: {cached_document_id}")
-        return {
-            "document_id": cached_document_id,
-            "message": f"Document already processed for {use_case} (from cache)",
-            "status": "DONE",
-            "cached": True
-        }
-    
-    # Step 4: New PDF - process it
-    document_id = str(uuid.uuid4())
-    print(f"🆕 New document - processing: {document_id}")
-    
-    # Step 5: Upload to Cloudinary
-    url = upload_file(file.file, f"{use_case}/uploads")
-    
-    # Step 6: Cache the PDF hash -> document_id mapping with use_case
-    cache_helper.cache_pdf_mapping(file_hash, document_id, use_case)
-    
-    # Step 7: Start background ingestion pipeline
-    background_tasks.add_task(
-        ingest_pipeline,
-        url,
-        use_case,
-        document_id
+    logger.debug("📝 File hash: %.16s...", file_hash)
+    
+    # Step 3: Check if this PDF was already processed (or is being
+    # processed) for this use_case - the mapping is written when ingestion starts
+    async def cached_document():
+        cached_id = await cache_helper.get_cached_document_id(file_hash, use_case)
+        if not cached_id or (revision and cached_id != document_id):
+            return None
+        status = (await document_status(cached_id))["status"]
+        # A failed (or expired) ingestion is retried by this upload
+        if status in ("FAILED", "UNKNOWN"):
+            return None
+        return {"document_id": cached_id, "status": status}
+    
+    cached = await cached_document()
+    if cached:
+        logger.info("✨ Using cached document for %s: %s (%s)", use_case, cached["document_id"], cached["status"])
+        return cached_upload_response(cached, use_case)
+    
+    # Step 4: New PDF (or new revision) - process it, unless the same file
+    # is being uploaded right now, in which case share that upload's result
+    result, shared = await upload_flight.do(
+        f"{use_case}:{file_hash}",
+        lambda: start_ingestion(file, file_content, file_hash, use_case, background_tasks, document_id),
+        cached_document
     )
+    if shared:
+        logger.info("🤝 Joined in-flight upload for %s: %s", use_case, result["document_id"])
+        return cached_upload_response(result, use_case)
 
     return {
-        "document_id": document_id,
-        "message": "Upload successful",
-        "status": "PROCESSING",
+        "document_id": result["document_id"],
+        "message": "Revision upload successful" if revision else "Upload successful",
+        "status": result["status"],
         "cached": False
     }
+
+def cached_upload_response(result: dict, use_case: str) -> dict:
+    """Response for an upload answered by an earlier (or in-flight) upload of the same file"""
+    if result["status"] == "DONE":
+        message = f"Document already processed for {use_case} (from cache)"
+    else:
+        message = f"Same document is already being processed for {use_case}"
+    return {
+        "document_id": result["document_id"],
+        "message": message,
+        "status": result["status"],
+        "cached": True
+    }
+
+async def start_ingestion(file: UploadFile, file_content: bytes, file_hash: str, use_case: str,
+                          background_tasks: BackgroundTasks, document_id: str = None) -> dict:
+    """
+    Spool, archive, record the file hash mapping and start ingestion
+    Returns {"document_id", "status"} - shared with concurrent uploads of the same file
+    """
+    revision = document_id is not None
+    if revision:
+        logger.info("📝 New revision - processing: %s", document_id)
+    else:
+        document_id = str(uuid.uuid4())
+        logger.info("🆕 New document - processing: %s", document_id)
+    
+    # Step 5: Spool the bytes we already have for ingestion and archive
+    # to Cloudinary concurrently - ingestion never downloads them back
+    path = await asyncio.to_thread(spool_upload, document_id, file_content)
+    task = asyncio.create_task(archive_upload(file_content, f"{use_case}/uploads", document_id))
+    _archive_tasks.add(task)
+    task.add_done_callback(_archive_tasks.discard)
+    
+    # Step 6 + 7: Cache the PDF hash -> document_id mapping and start
+    # ingestion - in queue mode both writes go out in one pipeline
+    async with async_redis_client.pipeline(transaction=True) as pipe:
+        if revision:
+            # Workers on other hosts must wait for this revision's archived copy
+            pipe.delete(f"doc:url:{document_id}")
+            # API processes may hold DONE (and answers) locally - they re-read
+            # Redis, and answer from the previous revision until this one is
+            # DONE, when the pipeline drops its cached answers
+            stage_invalidation(pipe, keys=[f"ingest:{document_id}"], prefixes=[f"query:{document_id}:"])
+        cache_helper.stage_pdf_mapping(pipe, file_hash, document_id, use_case)
+        if INGEST_MODE == "queue":
+            stage_ingest_job(pipe, path, use_case, document_id, file.filename, file_hash)
+        else:
+            # Set now, not when the background task starts - a revision
+            # would otherwise still read DONE from the previous one
+            pipe.set(f"ingest:{document_id}", "PROCESSING")
+        await pipe.execute()
+
+    if INGEST_MODE != "queue":
+        background_tasks.add_task(
+            ingest_pipeline,
+            path,
+            use_case,
+            document_id,
+            file.filename,
+            file_hash=file_hash
+        )
+
+    return {"document_id": document_id, "status": "PROCESSING"}
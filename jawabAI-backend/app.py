@@ -1,10 +1,24 @@
+import logging
 from fastapi import FastAPI, UploadFile, File, Form, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response, JSONResponse
 from api.upload import upload_document
-from api.chat import chat
-from storage.redis_client import redis_client
+from api.chat import chat, chat_stream, validate_chat_payload
+from api.status import document_status
+from api.fields import document_fields
+from api.metrics import collect_metrics, cache_stats
+from storage.redis_client import async_redis_client, async_redis_binary_client
+from utils.metrics import CONTENT_TYPE
+from utils.lazy import component_status
+from utils.cache_invalidation import listen_for_invalidations
+from utils.warmup import run_warmup, warmup_status
+from config.settings import LOG_LEVEL, LOG_FORMAT, WARMUP_ON_STARTUP, INGEST_MODE
+import asyncio
 import os
 
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
 app = FastAPI(
     title="JawabAI API",
     version="1.0.0",
@@ -35,15 +49,31 @@ async def startup_event():
     try:
         # Only clear cache in development, NOT in production
         if ENVIRONMENT == "development":
-            redis_client.flushdb()
-            print("✅ Cache cleared (development mode)")
+            await async_redis_client.flushdb()
+            logger.info("✅ Cache cleared (development mode)")
         
         # Test Redis connection
-        redis_client.ping()
-        print(f"🚀 FastAPI app initialized - Environment: {ENVIRONMENT}")
-        print("✅ Redis connected")
+        await async_redis_client.ping()
+        logger.info("🚀 FastAPI app initialized - Environment: %s", ENVIRONMENT)
+        logger.info("✅ Redis connected")
     except Exception as e:
-        print(f"⚠️ Redis connection warning: {e}")
+        logger.warning("⚠️ Redis connection warning: %s", e)
+
+    # Drop in-process cache entries when another process changes them
+    app.state.invalidation_listener = asyncio.create_task(listen_for_invalidations())
+
+    # Preload models/clients in the background - the API accepts requests
+    # immediately and /health reports ready once warm
+    if WARMUP_ON_STARTUP:
+        app.state.warmup = asyncio.create_task(
+            asyncio.to_thread(run_warmup, for_chat=True, for_ingest=INGEST_MODE != "queue")
+        )
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.invalidation_listener.cancel()
+    await async_redis_client.aclose()
+    await async_redis_binary_client.aclose()
 
 @app.get("/")
 async def root():
@@ -56,32 +86,101 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check for Railway monitoring"""
+    """
+    Health check for Railway monitoring
+    "ready" turns true once the startup warmup has loaded the models
+    (status is "starting" until then); components shows each lazy
+    model/client: not_loaded, loading, ready or failed. A failed
+    component makes the status "degraded" (still a 200) - the next
+    request that needs it retries the load, so a blip during warmup
+    (Pinecone, Redis) must not get a recoverable process restarted.
+    """
     try:
-        redis_client.ping()
+        await async_redis_client.ping()
         redis_status = "connected"
     except Exception as e:
         redis_status = f"disconnected: {str(e)}"
     
+    components = component_status()
+    warmup = warmup_status()
+    failed = [name for name, component in components.items() if component["state"] == "failed"]
+    ready = (warmup["done"] or not WARMUP_ON_STARTUP) and not failed
+    
+    if failed or redis_status != "connected":
+        status = "degraded"
+    elif not ready:
+        status = "starting"
+    else:
+        status = "healthy"
+    
     return {
-        "status": "healthy" if "connected" in redis_status else "degraded",
+        "status": status,
+        "ready": ready,
         "services": {
             "api": "up",
             "redis": redis_status
-        }
+        },
+        "components": components,
+        "failed_components": failed,
+        "warmup_seconds": warmup["seconds"]
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage timings, cache hit/miss counters, queue depths"""
+    return Response(await collect_metrics(), media_type=CONTENT_TYPE)
+
+@app.get("/cache/stats")
+async def cache_statistics():
+    """Per-tier cache hit rates and in-process cache sizes"""
+    return cache_stats()
+
 @app.post("/upload")
 async def upload(
     file: UploadFile = File(...),
     use_case: str = Form("study"),
     background_tasks: BackgroundTasks = None
 ):
-    return upload_document(file, use_case, background_tasks)
+    return await upload_document(file, use_case, background_tasks)
+
+@app.post("/documents/{document_id}/revisions")
+async def upload_revision(
+    document_id: str,
+    file: UploadFile = File(...),
+    use_case: str = Form("study"),
+    background_tasks: BackgroundTasks = None
+):
+    """Replace a document with a new revision; only pages that changed are re-embedded"""
+    return await upload_document(file, use_case, background_tasks, document_id=document_id)
+
+@app.get("/status/{document_id}")
+async def status(document_id: str):
+    """Ingestion status and percent complete (updated as vector batches are upserted)"""
+    return await document_status(document_id)
+
+@app.get("/documents/{document_id}/fields")
+async def fields(document_id: str):
+    """Invoice fields (vendor, total, tax, GSTIN, ...) extracted at ingest time"""
+    return await document_fields(document_id)
 
 @app.post("/chat")
 async def chat_api(payload: dict):
-    return chat(payload)
+    error = validate_chat_payload(payload)
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+    return await chat(payload)
+
+@app.post("/chat/stream")
+async def chat_stream_api(payload: dict):
+    """Stream the answer as Server-Sent Events (sources first, then tokens)"""
+    error = validate_chat_payload(payload)
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+    return StreamingResponse(
+        chat_stream(payload),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # Required for Railway to bind correct port
 if __name__ == "__main__":
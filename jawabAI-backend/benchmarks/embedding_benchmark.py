@@ -0,0 +1,77 @@
+"""
+Embedding throughput benchmark - chunks/sec for each embedding backend
+
+Run from jawabAI-backend/:
+    python -m benchmarks.embedding_benchmark --chunks 500
+
+Backends whose optional dependencies are missing are reported and skipped.
+"""
+
+import argparse
+import random
+import time
+
+BACKENDS = ["torch", "onnx", "onnx-int8"]
+
+WORDS = (
+    "photosynthesis chlorophyll energy light reaction glucose carbon dioxide "
+    "invoice total amount tax gst vendor payment due date balance "
+    "the a of and to in is that for it as with was on be by"
+).split()
+
+
+def make_chunks(n: int, seed: int = 0) -> list[str]:
+    """Synthetic chunks with a realistic spread of lengths (20-220 words)"""
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 220)))
+        for _ in range(n)
+    ]
+
+
+def bench_backend(backend: str, chunks: list[str], batch_size: str, repeats: int) -> dict:
+    from processing.embedder import EmbeddingEngine
+
+    engine = EmbeddingEngine(backend=backend, batch_size=batch_size)
+    engine.encode(chunks[:8])  # warm up
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        engine.encode(chunks)
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    return {
+        "backend": backend,
+        "batch_size": engine.batch_size,
+        "seconds": round(best, 3),
+        "chunks_per_sec": round(len(chunks) / best, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--batch-size", default="auto")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--backends", nargs="+", default=BACKENDS)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks)
+    print(f"\n🧪 Embedding {len(chunks)} chunks (best of {args.repeats})\n")
+
+    for backend in args.backends:
+        try:
+            result = bench_backend(backend, chunks, args.batch_size, args.repeats)
+        except RuntimeError as e:
+            print(f"   ⏭️  {backend:<10} skipped: {e}")
+            continue
+        print(
+            f"   {result['backend']:<10} batch={result['batch_size']:<4} "
+            f"{result['seconds']:>7.2f}s  {result['chunks_per_sec']:>8.1f} chunks/sec"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Local stand-ins for the external services, for offline benchmarks
+
+- Redis      -> fakeredis (one in-process server shared by all four clients)
+- Pinecone   -> the local vector store under a temp directory
+- Gemini     -> StubModel, a deterministic model with configurable latency
+- Cloudinary -> copies uploads into a local directory
+
+install() must run before any app module is imported: modules bind the
+clients at import time (from storage.redis_client import redis_client).
+"""
+
+import asyncio
+import os
+import shutil
+import time
+import uuid
+
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubModel:
+    """
+    Stands in for genai.GenerativeModel
+
+    The answer is the first sentence of the prompt's document context, so
+    it depends only on retrieval. latency_ms is spent before the first
+    token; streamed answers are split into stream_chunks pieces.
+    """
+
+    def __init__(self, latency_ms: float = 300, stream_chunks: int = 8):
+        self.latency = latency_ms / 1000
+        self.stream_chunks = stream_chunks
+
+    def _answer(self, prompt: str) -> str:
+        context = prompt.split("DOCUMENT CONTEXT:", 1)[-1].split("--------------------", 1)[0].strip()
+        sentence = context.split(". ", 1)[0][:300]
+        return f"According to the document: {sentence}." if sentence else "The document does not contain this information."
+
+    def generate_content(self, prompt, **kwargs):
+        time.sleep(self.latency)
+        return _StubResponse(self._answer(prompt))
+
+    async def generate_content_async(self, prompt, stream: bool = False, **kwargs):
+        await asyncio.sleep(self.latency)
+        answer = self._answer(prompt)
+        if not stream:
+            return _StubResponse(answer)
+
+        size = max(1, len(answer) // self.stream_chunks)
+
+        async def chunks():
+            for start in range(0, len(answer), size):
+                await asyncio.sleep(0)
+                yield _StubResponse(answer[start:start + size])
+        return chunks()
+
+
+def _local_upload(store_dir: str):
+    def upload_file(file, folder):
+        path = os.path.join(store_dir, folder, f"{uuid.uuid4()}.pdf")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as out:
+            shutil.copyfileobj(file, out)
+        return path
+    return upload_file
+
+
+def install(workdir: str, llm_latency_ms: float = 300):
+    """Point settings at workdir and swap every external client for its stand-in"""
+    # Settings are read at import, so these must be in place first
+    os.environ.setdefault("UPSTASH_REDIS_REST_URL", "redis://localhost:6379/0")
+    os.environ["VECTOR_STORE"] = "local"
+    os.environ["VECTOR_STORE_DIR"] = os.path.join(workdir, "vectors")
+    os.environ["INGEST_SPOOL_DIR"] = os.path.join(workdir, "spool")
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(workdir, "embeddings.sqlite")
+    os.environ["INGEST_MODE"] = "background"
+    os.environ.setdefault("EMBEDDING_CACHE_BACKEND", "off")
+
+    import fakeredis
+    import fakeredis.aioredis
+    from storage import redis_client
+
+    server = fakeredis.FakeServer()
+    redis_client.redis_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    redis_client.redis_binary_client = fakeredis.FakeRedis(server=server)
+    redis_client.async_redis_client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    redis_client.async_redis_binary_client = fakeredis.aioredis.FakeRedis(server=server)
+
+    from storage import cloudinary_client
+    cloudinary_client.upload_file = _local_upload(os.path.join(workdir, "files"))
+
+    from llm import generator
+    generator.model.set(StubModel(llm_latency_ms))
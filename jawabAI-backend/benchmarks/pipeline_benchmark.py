@@ -0,0 +1,209 @@
+"""
+End-to-end ingest / chat benchmark against local stand-ins (no network)
+
+Redis, Pinecone, Gemini and Cloudinary are replaced by the fakes in
+benchmarks/fakes.py. The embedding model is real, since it is part of
+the hot path. Synthetic PDFs of each --pages size are ingested
+concurrently, then /chat is driven concurrently. Two chat phases run:
+unique questions (full path: embed, retrieve, LLM) and repeats (cache
+hits). Results are written as JSON for comparison across commits.
+
+Run from jawabAI-backend/ (needs fakeredis):
+    python -m benchmarks.pipeline_benchmark --pages 1 10 50 --docs 4 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from benchmarks import fakes
+
+WORDS = (
+    "photosynthesis chlorophyll energy light reaction glucose carbon dioxide oxygen "
+    "cell membrane nucleus protein enzyme mitochondria respiration water plant "
+    "the a of and to in is that for it as with was on be by"
+).split()
+
+
+def make_pdf(path: str, pages: int, use_case: str, seed: int):
+    """Synthetic PDF: ~400 words of prose per page; invoices also get field lines"""
+    import fitz
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for page_number in range(pages):
+        lines = []
+        if use_case == "invoice":
+            lines += [
+                f"Vendor: Supplier {seed} Pvt Ltd",
+                f"Invoice No: INV-{seed:04d}/{page_number + 1:03d}",
+                "Invoice Date: 12/03/2024",
+                f"Subtotal: {rng.randint(100, 9000)}.00",
+                f"Total Tax: {rng.randint(10, 900)}.00",
+                f"Grand Total: {rng.randint(1000, 9999)}.00",
+                "Payment Terms: Net 30 days"
+            ]
+        for _ in range(40):
+            lines.append(" ".join(rng.choice(WORDS) for _ in range(10)).capitalize() + ".")
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), "\n".join(lines), fontsize=7)
+    doc.save(path)
+    doc.close()
+
+
+def summarize(latencies: list[float], elapsed: float, units: int = None) -> dict:
+    """Throughput and latency percentiles (milliseconds)"""
+    ms = np.asarray(latencies) * 1000
+    summary = {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "throughput_per_sec": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "p95_ms": round(float(np.percentile(ms, 95)), 1),
+        "p99_ms": round(float(np.percentile(ms, 99)), 1),
+        "max_ms": round(float(ms.max()), 1)
+    }
+    if units is not None:
+        summary["pages_per_sec"] = round(units / elapsed, 1) if elapsed else None
+    return summary
+
+
+def bench_ingest(workdir: str, pages: int, docs: int, concurrency: int, use_case: str) -> tuple[dict, list[str]]:
+    from ingestion.pipeline import ingest_pipeline
+
+    paths = []
+    for i in range(docs):
+        path = os.path.join(workdir, f"synthetic-{pages}p-{i}.pdf")
+        make_pdf(path, pages, use_case, seed=pages * 1000 + i)
+        paths.append(path)
+
+    def run(path):
+        document_id = os.path.splitext(os.path.basename(path))[0]
+        start = time.perf_counter()
+        ingest_pipeline(path, use_case, document_id, os.path.basename(path))
+        return document_id, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(run, paths))
+    elapsed = time.perf_counter() - start
+
+    document_ids = [document_id for document_id, _ in results]
+    return summarize([latency for _, latency in results], elapsed, units=pages * docs), document_ids
+
+
+async def bench_chat(payloads: list[dict], concurrency: int) -> dict:
+    from api.chat import chat
+
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def run(payload):
+        nonlocal errors
+        async with slots:
+            start = time.perf_counter()
+            response = await chat(payload)
+            latencies.append(time.perf_counter() - start)
+            if "error" in response:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(payload) for payload in payloads))
+    summary = summarize(latencies, time.perf_counter() - start)
+    summary["errors"] = errors
+    return summary
+
+
+async def bench_chat_phases(payloads: list[dict], concurrency: int) -> dict:
+    """Both phases on one event loop (the async clients and query batcher are loop-bound)"""
+    return {
+        "miss": await bench_chat(payloads, concurrency),
+        "hit": await bench_chat(payloads, concurrency)
+    }
+
+
+def make_questions(n: int, seed: int) -> list[str]:
+    """Distinct questions (random topic words, so the semantic cache rarely matches)"""
+    rng = random.Random(seed)
+    topics = [w for w in WORDS if len(w) > 3]
+    return [f"What does the document say about {' and '.join(rng.sample(topics, 3))}?" for _ in range(n)]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 50], help="synthetic PDF sizes")
+    parser.add_argument("--docs", type=int, default=4, help="documents per size")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--chat-requests", type=int, default=100)
+    parser.add_argument("--chat-concurrency", type=int, default=16)
+    parser.add_argument("--use-case", default="study", choices=["study", "invoice"])
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--output", help="JSON path (default benchmarks/results/pipeline-<commit>.json)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="jawabai-bench-")
+    fakes.install(workdir, args.llm_latency_ms)
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": vars(args),
+        "ingest": {},
+        "chat": {}
+    }
+
+    print(f"\n🧪 Pipeline benchmark ({commit}) - workdir {workdir}\n")
+    document_ids = []
+    for pages in args.pages:
+        summary, ids = bench_ingest(workdir, pages, args.docs, args.concurrency, args.use_case)
+        document_ids += ids
+        results["ingest"][f"{pages}_pages"] = summary
+        print(
+            f"   ingest {pages:>4} pages x {args.docs}: {summary['pages_per_sec']:>7} pages/s  "
+            f"p50 {summary['p50_ms']:>8}ms  p95 {summary['p95_ms']:>8}ms  p99 {summary['p99_ms']:>8}ms"
+        )
+
+    questions = make_questions(args.chat_requests, seed=1)
+    rng = random.Random(2)
+    payloads = [
+        {"document_id": rng.choice(document_ids), "question": q, "use_case": args.use_case}
+        for q in questions
+    ]
+    results["chat"] = asyncio.run(bench_chat_phases(payloads, args.chat_concurrency))
+    for phase, summary in results["chat"].items():
+        print(
+            f"   chat ({phase:<4}) x {summary['requests']}: {summary['throughput_per_sec']:>7} req/s  "
+            f"p50 {summary['p50_ms']:>8}ms  p95 {summary['p95_ms']:>8}ms  p99 {summary['p99_ms']:>8}ms"
+        )
+
+    output = args.output or os.path.join(os.path.dirname(__file__), "results", f"pipeline-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n📄 Results written to {output}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,3 +11,180 @@ REDIS_URL = os.getenv("UPSTASH_REDIS_REST_URL")
 REDIS_TOKEN = os.getenv("UPSTASH_REDIS_REST_TOKEN")
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+# Ingestion - "background" runs the pipeline in the API process (FastAPI
+# BackgroundTasks), "queue" hands jobs to the Redis queue for worker.py
+INGEST_MODE = os.getenv("INGEST_MODE", "background")
+INGEST_QUEUE = "ingest:queue"
+INGEST_WORKER_PROCESSES = int(os.getenv("INGEST_WORKER_PROCESSES", "2"))
+INGEST_WORKER_CONCURRENCY = int(os.getenv("INGEST_WORKER_CONCURRENCY", "2"))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "3"))
+INGEST_RETRY_BACKOFF = float(os.getenv("INGEST_RETRY_BACKOFF", "5"))
+INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "64"))
+INGEST_STAGE_QUEUE_SIZE = int(os.getenv("INGEST_STAGE_QUEUE_SIZE", "4"))
+# Workers are named {INGEST_WORKER_ID}:{process index} (hostname when
+# unset) and refresh a heartbeat every third of INGEST_WORKER_HEARTBEAT_TTL
+# seconds; jobs held by a worker whose heartbeat expired are re-queued
+INGEST_WORKER_ID = os.getenv("INGEST_WORKER_ID")
+INGEST_WORKER_HEARTBEAT_TTL = int(os.getenv("INGEST_WORKER_HEARTBEAT_TTL", "30"))
+
+# Embeddings - backend is "torch" (SentenceTransformer), "onnx" or
+# "onnx-int8" (ONNX Runtime, dynamic int8 quantized), or "server" (the
+# host's embedding server, see below). Batch size "auto" picks one based
+# on the available hardware.
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_BATCH_SIZE = os.getenv("EMBEDDING_BATCH_SIZE", "auto")
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", ".onnx")
+# Intra-op threads for the torch / ONNX Runtime backends (0 = library default)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+
+# Per-host embedding server (embedding_server.py) - with
+# EMBEDDING_BACKEND=server every API / ingest worker on the host sends
+# encode requests to it over a Unix socket instead of loading its own
+# model. The server runs EMBEDDING_SERVER_BACKEND and combines requests
+# arriving within EMBEDDING_SERVER_MAX_WAIT_MS into one batch.
+EMBEDDING_SOCKET = os.getenv("EMBEDDING_SOCKET", os.path.join(tempfile.gettempdir(), "jawabai-embed.sock"))
+EMBEDDING_SERVER_BACKEND = os.getenv("EMBEDDING_SERVER_BACKEND", "torch")
+EMBEDDING_SERVER_MAX_BATCH = int(os.getenv("EMBEDDING_SERVER_MAX_BATCH", "256"))
+EMBEDDING_SERVER_MAX_WAIT_MS = float(os.getenv("EMBEDDING_SERVER_MAX_WAIT_MS", "2"))
+EMBEDDING_SERVER_TIMEOUT = float(os.getenv("EMBEDDING_SERVER_TIMEOUT", "30"))
+
+# Query embedding micro-batching - concurrent /chat requests arriving
+# within QUERY_EMBED_MAX_WAIT_MS are encoded in one forward pass
+QUERY_EMBED_MAX_BATCH_SIZE = int(os.getenv("QUERY_EMBED_MAX_BATCH_SIZE", "32"))
+QUERY_EMBED_MAX_WAIT_MS = float(os.getenv("QUERY_EMBED_MAX_WAIT_MS", "5"))
+
+# Chunk embedding cache keyed by (model, chunk text hash) - "redis",
+# "disk" (local SQLite file with LRU eviction) or "off"
+EMBEDDING_CACHE_BACKEND = os.getenv("EMBEDDING_CACHE_BACKEND", "redis")
+EMBEDDING_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", str(30 * 86400)))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+# Semantic query cache - a new question reuses a cached answer when its
+# embedding's cosine similarity to an answered question is above this
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+
+# Vector store - "pinecone" (remote index) or "local" (in-process NumPy /
+# HNSW index persisted as memory-mapped files under VECTOR_STORE_DIR)
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone")
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", ".vectors")
+LOCAL_INDEX_BRUTE_FORCE_MAX = int(os.getenv("LOCAL_INDEX_BRUTE_FORCE_MAX", "20000"))
+
+# PDF loading - documents with at least LOADER_PARALLEL_MIN_PAGES pages
+# are extracted across a pool of LOADER_WORKERS processes
+LOADER_WORKERS = int(os.getenv("LOADER_WORKERS", str(min(4, os.cpu_count() or 1))))
+LOADER_PARALLEL_MIN_PAGES = int(os.getenv("LOADER_PARALLEL_MIN_PAGES", "50"))
+LOADER_PAGES_PER_TASK = int(os.getenv("LOADER_PAGES_PER_TASK", "16"))
+
+# Uploaded PDFs are spooled here and ingested from disk while the
+# archival copy goes to Cloudinary in parallel. In queue mode, workers on
+# other hosts fall back to the archived URL.
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "jawabai-uploads"))
+
+# Chunking - sizes are in embedding-tokenizer tokens (MiniLM truncates at
+# 256). With CHUNK_CROSS_PAGE chunks may span pages and record page_end.
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "240"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+CHUNK_CROSS_PAGE = os.getenv("CHUNK_CROSS_PAGE", "false").lower() == "true"
+
+# Redis connection pools and the small in-process cache for hot keys
+# (document status, PDF mappings, answers) in front of Redis
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", "30"))
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "10000"))
+
+# Tiered caching - each in-process cache is also bounded by (approximate)
+# size, and entries that keep getting hits have their TTL extended: one
+# more base TTL per doubling of hits, up to the MAX_TTL of their tier. In
+# Redis this applies to answers and PDF mappings. Writers publish changed
+# keys on CACHE_INVALIDATION_CHANNEL so every API process drops its copy.
+LOCAL_CACHE_MAX_BYTES = int(os.getenv("LOCAL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LOCAL_CACHE_MAX_TTL = float(os.getenv("LOCAL_CACHE_MAX_TTL", "300"))
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "3600"))
+QUERY_CACHE_MAX_TTL = int(os.getenv("QUERY_CACHE_MAX_TTL", str(86400)))
+PDF_CACHE_TTL = int(os.getenv("PDF_CACHE_TTL", str(86400)))
+PDF_CACHE_MAX_TTL = int(os.getenv("PDF_CACHE_MAX_TTL", str(30 * 86400)))
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache:invalidate")
+
+# Serialization - cached payloads above SERIALIZE_COMPRESS_MIN_BYTES are
+# zstd-compressed (when zstandard is installed). Cached vectors are stored
+# as raw float32 or float16 buffers. With CHUNK_TEXT_STORE=redis chunk
+# text is stored once per document (chunks:{document_id}) instead of in
+# every vector's metadata.
+SERIALIZE_COMPRESS_MIN_BYTES = int(os.getenv("SERIALIZE_COMPRESS_MIN_BYTES", "1024"))
+VECTOR_CACHE_DTYPE = os.getenv("VECTOR_CACHE_DTYPE", "float32")
+CHUNK_TEXT_STORE = os.getenv("CHUNK_TEXT_STORE", "redis")
+
+# Vector upserts - sent in UPSERT_BATCH_SIZE batches over at most
+# UPSERT_CONCURRENCY concurrent requests, each retried with exponential backoff
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", "4"))
+UPSERT_MAX_RETRIES = int(os.getenv("UPSERT_MAX_RETRIES", "4"))
+UPSERT_RETRY_BACKOFF = float(os.getenv("UPSERT_RETRY_BACKOFF", "0.5"))
+
+# Retrieval - matches per chat, and with several documents (a course
+# pack) the most any single document may contribute and the most
+# documents one chat may name
+CHAT_TOP_K = int(os.getenv("CHAT_TOP_K", "5"))
+MULTI_DOC_QUOTA = int(os.getenv("MULTI_DOC_QUOTA", "3"))
+CHAT_MAX_DOCUMENTS = int(os.getenv("CHAT_MAX_DOCUMENTS", "20"))
+
+# Context assembly - retrieved chunks are merged, deduplicated and packed
+# into at most CONTEXT_TOKEN_BUDGET (estimated) tokens before the LLM call
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+
+# Hybrid retrieval - a BM25 index per namespace (built at ingest, stored
+# in Redis as bm25:{namespace}) is searched alongside the dense query and
+# the HYBRID_CANDIDATES best of each are merged by reciprocal-rank fusion.
+# Lexical-only hits need their text in Redis, so hybrid ingestion always
+# writes chunks:{document_id}.
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+BM25_CACHE_MAX_INDEXES = int(os.getenv("BM25_CACHE_MAX_INDEXES", "256"))
+BM25_CACHE_TTL = float(os.getenv("BM25_CACHE_TTL", "600"))
+
+# Optional CPU cross-encoder that re-scores the fused candidates
+# (e.g. "cross-encoder/ms-marco-MiniLM-L-6-v2"); empty disables it
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "")
+RERANKER_CANDIDATES = int(os.getenv("RERANKER_CANDIDATES", "20"))
+RERANKER_BATCH_SIZE = int(os.getenv("RERANKER_BATCH_SIZE", "32"))
+
+# Invoice fields (vendor, total, tax, GSTIN, ...) are extracted once at
+# ingest by regex rules, optionally with one LLM call for fields the rules
+# miss. Short field questions are answered from them without retrieval.
+INVOICE_LLM_EXTRACTION = os.getenv("INVOICE_LLM_EXTRACTION", "false").lower() == "true"
+INVOICE_LLM_MAX_CHARS = int(os.getenv("INVOICE_LLM_MAX_CHARS", "12000"))
+INVOICE_SHORTCUT_MAX_WORDS = int(os.getenv("INVOICE_SHORTCUT_MAX_WORDS", "12"))
+
+# Request coalescing - concurrent identical uploads (same file hash) and
+# questions (same query cache key) share the first request's result
+# instead of repeating the work. The first request holds a Redis lease
+# (lease:{name}:{key}, SET NX PX) for at most the lease time while the
+# others poll for its result every COALESCE_POLL_MS, backing off to
+# COALESCE_MAX_POLL_MS.
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "true").lower() == "true"
+COALESCE_POLL_MS = float(os.getenv("COALESCE_POLL_MS", "50"))
+COALESCE_MAX_POLL_MS = float(os.getenv("COALESCE_MAX_POLL_MS", "500"))
+UPLOAD_LEASE_MS = int(os.getenv("UPLOAD_LEASE_MS", "30000"))
+CHAT_LEASE_MS = int(os.getenv("CHAT_LEASE_MS", "60000"))
+
+# Logging - module loggers replace the old print calls; DEBUG includes
+# per-request cache and retrieval detail
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+# Metrics - the API serves /metrics; ingestion workers serve their own on
+# WORKER_METRICS_PORT + process index (requires prometheus_client; 0 disables)
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+
+# Startup - models and clients load lazily on first use. With
+# WARMUP_ON_STARTUP the API (in the background) and workers preload them
+# and run one dummy call; /health reports ready once that is done.
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
@@ -0,0 +1,148 @@
+"""
+Embedding server - one process per host owns the embedding model and
+serves encode requests to every API / ingest worker over a Unix socket
+
+Run before the API and workers, then set EMBEDDING_BACKEND=server in
+their environment:
+    python embedding_server.py
+
+The model runs on EMBEDDING_SERVER_BACKEND ("torch", "onnx" or
+"onnx-int8") with EMBEDDING_THREADS intra-op threads. Requests that
+arrive within EMBEDDING_SERVER_MAX_WAIT_MS of each other, from any
+client, are combined into one encode call of up to
+EMBEDDING_SERVER_MAX_BATCH texts.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import numpy as np
+from processing.embedder import EmbeddingEngine
+from processing.embedding_rpc import frame, read_frame, VECTORS, INFO, ERROR
+from utils.serialization import pack, unpack
+from config.settings import (
+    EMBEDDING_SOCKET, EMBEDDING_SERVER_BACKEND, EMBEDDING_SERVER_MAX_BATCH,
+    EMBEDDING_SERVER_MAX_WAIT_MS, LOG_LEVEL, LOG_FORMAT
+)
+
+logger = logging.getLogger(__name__)
+
+
+class BatchCombiner:
+    """
+    Merges concurrent encode requests into one model call
+
+    Same idea as QueryEmbeddingBatcher, but each caller submits a list
+    of texts: requests are gathered until max_batch texts are waiting or
+    max_wait passes, encoded together, and the rows split back out.
+    """
+
+    def __init__(self, engine: EmbeddingEngine, max_batch: int = EMBEDDING_SERVER_MAX_BATCH,
+                 max_wait_ms: float = EMBEDDING_SERVER_MAX_WAIT_MS):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = asyncio.Queue()
+
+    async def encode(self, texts: list[str]) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        size = len(batch[0][0])
+        deadline = loop.time() + self.max_wait
+
+        while size < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                request = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    async def run(self):
+        while True:
+            batch = await self._collect()
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            try:
+                # One thread owns the model; its intra-op threads do the parallel work
+                vectors = await asyncio.to_thread(self.engine.encode, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            start = 0
+            for request_texts, future in batch:
+                end = start + len(request_texts)
+                if not future.done():
+                    future.set_result(vectors[start:end])
+                start = end
+
+
+async def handle_client(reader, writer, engine: EmbeddingEngine, combiner: BatchCombiner):
+    try:
+        while True:
+            try:
+                request = unpack(await read_frame(reader))
+            except asyncio.IncompleteReadError:
+                return
+
+            try:
+                if request.get("op") == "info":
+                    response = bytes([INFO]) + pack({
+                        "model": engine.model_name,
+                        "backend": engine.backend_name,
+                        "dim": engine.dim,
+                        "max_seq_length": engine.backend.max_seq_length
+                    })
+                else:
+                    vectors = await combiner.encode(request["texts"])
+                    response = bytes([VECTORS]) + np.ascontiguousarray(vectors, dtype=np.float32).tobytes()
+            except Exception as e:
+                logger.warning("⚠️ Embedding request failed: %s", e)
+                response = bytes([ERROR]) + str(e).encode()
+
+            writer.write(frame(response))
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve():
+    engine = EmbeddingEngine(backend=EMBEDDING_SERVER_BACKEND)
+    engine.encode(["warmup"])
+    combiner = BatchCombiner(engine)
+    batcher = asyncio.create_task(combiner.run())
+
+    if os.path.exists(EMBEDDING_SOCKET):
+        os.remove(EMBEDDING_SOCKET)
+    server = await asyncio.start_unix_server(
+        lambda r, w: handle_client(r, w, engine, combiner), path=EMBEDDING_SOCKET
+    )
+    logger.info("🧠 Embedding server listening on %s (%s on %s)", EMBEDDING_SOCKET, engine.model_name, engine.backend_name)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    async with server:
+        await stop.wait()
+    batcher.cancel()
+    os.remove(EMBEDDING_SOCKET)
+    logger.info("👋 Embedding server stopped")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+    asyncio.run(serve())
@@ -0,0 +1,134 @@
+"""
+Redis-backed ingestion job queue
+
+Keys:
+- ingest:queue                      -> list of pending jobs (LPUSH / BRPOPLPUSH)
+- ingest:queue:delayed              -> zset of jobs waiting for a retry (score = run at)
+- ingest:queue:processing:{worker}  -> jobs currently held by a worker, so a
+                                       crashed worker's jobs can be re-queued
+- ingest:queue:heartbeat:{worker}   -> set (with a TTL) while the worker is alive
+"""
+
+import logging
+import json
+import time
+from storage.redis_client import redis_client, async_redis_client
+from config.settings import INGEST_QUEUE, INGEST_MAX_RETRIES, INGEST_RETRY_BACKOFF, INGEST_WORKER_HEARTBEAT_TTL
+
+logger = logging.getLogger(__name__)
+
+DELAYED_QUEUE = f"{INGEST_QUEUE}:delayed"
+
+
+def processing_key(worker_name: str) -> str:
+    return f"{INGEST_QUEUE}:processing:{worker_name}"
+
+
+def heartbeat_key(worker_name: str) -> str:
+    return f"{INGEST_QUEUE}:heartbeat:{worker_name}"
+
+
+def heartbeat(worker_name: str, ttl: int = INGEST_WORKER_HEARTBEAT_TTL):
+    """Mark this worker alive for ttl seconds"""
+    redis_client.set(heartbeat_key(worker_name), int(time.time()), ex=ttl)
+
+
+def stage_ingest_job(pipe, source: str, use_case: str, document_id: str, filename: str = None,
+                     file_hash: str = None):
+    """Queue the job push on an existing pipeline (batched with other upload writes)"""
+    job = {
+        "source": source,
+        "use_case": use_case,
+        "document_id": document_id,
+        "filename": filename,
+        "file_hash": file_hash,
+        "attempts": 0
+    }
+    pipe.set(f"ingest:{document_id}", "QUEUED")
+    pipe.lpush(INGEST_QUEUE, json.dumps(job))
+    logger.info("📥 Queued ingestion job for document ID '%s'", document_id)
+
+
+def next_job(worker_name: str, timeout: int = 5):
+    """
+    Atomically move the next job into this worker's processing list
+    Returns (raw, job) or (None, None) on timeout
+    """
+    raw = redis_client.brpoplpush(INGEST_QUEUE, processing_key(worker_name), timeout=timeout)
+    if raw is None:
+        return None, None
+    return raw, json.loads(raw)
+
+
+def ack_job(worker_name: str, raw: str):
+    """Remove a finished job from this worker's processing list"""
+    redis_client.lrem(processing_key(worker_name), 1, raw)
+
+
+def retry_job(worker_name: str, raw: str, job: dict):
+    """
+    Schedule a failed job for another attempt with exponential backoff,
+    or mark the document FAILED once retries are exhausted
+    """
+    job["attempts"] += 1
+    document_id = job["document_id"]
+
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.lrem(processing_key(worker_name), 1, raw)
+    if job["attempts"] > INGEST_MAX_RETRIES:
+        pipe.set(f"ingest:{document_id}", "FAILED")
+        logger.error("❌ Giving up on document ID '%s' after %d retries", document_id, INGEST_MAX_RETRIES)
+    else:
+        delay = INGEST_RETRY_BACKOFF * (2 ** (job["attempts"] - 1))
+        pipe.set(f"ingest:{document_id}", "QUEUED")
+        pipe.zadd(DELAYED_QUEUE, {json.dumps(job): time.time() + delay})
+        logger.warning("🔁 Retrying document ID '%s' in %.0fs (attempt %d)", document_id, delay, job["attempts"])
+    pipe.execute()
+
+
+def promote_delayed_jobs():
+    """Move retry jobs whose backoff has expired back onto the main queue"""
+    for raw in redis_client.zrangebyscore(DELAYED_QUEUE, 0, time.time()):
+        # Only the worker that wins the ZREM re-queues the job
+        if redis_client.zrem(DELAYED_QUEUE, raw):
+            redis_client.lpush(INGEST_QUEUE, raw)
+
+
+def _requeue(key: str) -> int:
+    moved = 0
+    while redis_client.rpoplpush(key, INGEST_QUEUE):
+        moved += 1
+    return moved
+
+
+def requeue_orphaned_jobs(worker_name: str = None):
+    """
+    Re-queue jobs held by workers whose heartbeat has expired - including
+    ones that will never come back under the same name (e.g. a container
+    replaced on deploy). With worker_name, that worker's own list is
+    re-queued unconditionally (its previous run crashed).
+    """
+    if worker_name is not None:
+        _requeue(processing_key(worker_name))
+
+    prefix = processing_key("")
+    for key in redis_client.scan_iter(match=f"{prefix}*", count=100):
+        owner = key[len(prefix):]
+        if owner == worker_name or redis_client.exists(heartbeat_key(owner)):
+            continue
+        moved = _requeue(key)
+        if moved:
+            logger.warning("♻️ Re-queued %d job(s) orphaned by worker %s", moved, owner)
+
+
+def queue_depth() -> int:
+    return redis_client.llen(INGEST_QUEUE) + redis_client.zcard(DELAYED_QUEUE)
+
+
+async def aqueue_depths() -> dict:
+    """Pending and delayed (awaiting retry) job counts in one round trip"""
+    async with async_redis_client.pipeline(transaction=False) as pipe:
+        pipe.llen(INGEST_QUEUE)
+        pipe.zcard(DELAYED_QUEUE)
+        pending, delayed = await pipe.execute()
+    return {"ingest": pending, "ingest_delayed": delayed}
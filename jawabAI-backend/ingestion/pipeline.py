@@ -1,34 +1,330 @@
-from processing.loader import load_pdf
-from processing.chunker import chunk_text
-from processing.embedder import embed
-from retrieval.pinecone_client import upsert
+import logging
+import os
+import queue
+import threading
+from processing.loader import iter_pdf_pages
+from processing.chunker import PageChunker
+from processing.embedding_cache import embed_chunks
+from processing.invoice_fields import InvoiceFieldExtractor
+from retrieval.batch_upsert import BatchUpserter
+from retrieval.bm25 import BM25Builder, save_bm25_index, bm25_key
+from retrieval.vector_store import vector_store
 from storage.redis_client import redis_client
+from storage.spool import remove_spooled
+from storage.chunk_store import save_chunk_texts, load_chunk_texts, delete_chunk_texts
+from storage.field_store import save_invoice_fields, field_store_key
+from storage.page_manifest import page_hash, save_page_manifest, load_page_manifest
+from utils.metrics import timed, timed_function, timed_iter
+from utils.cache_invalidation import publish_invalidation
+from config.settings import (
+    INGEST_EMBED_BATCH_SIZE, INGEST_STAGE_QUEUE_SIZE, CHUNK_TEXT_STORE, HYBRID_SEARCH,
+    EMBEDDING_MODEL, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS
+)
 
-def ingest_pipeline(file_url, use_case, document_id):
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stage's output
+_END = object()
+
+
+def _put(q, item, failed):
+    """Blocking put that gives up once another stage has failed"""
+    while not failed.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, failed):
+    """Blocking get that returns _END once another stage has failed"""
+    while not failed.is_set():
+        try:
+            return q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+    return _END
+
+
+def _run_stage(target, errors, failed):
+    """Run one pipeline stage in its own thread, recording the first error"""
+    def runner():
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+            failed.set()
+
+    thread = threading.Thread(target=runner, daemon=True)
+    thread.start()
+    return thread
+
+
+def _resolve_source(source, document_id):
+    """
+    Prefer the spooled local file; a worker on another host falls back to
+    the archived Cloudinary URL (raises until the archival upload is done,
+    so the job is retried with backoff)
+    """
+    if source.startswith("http") or os.path.exists(source):
+        return source
+    url = redis_client.get(f"doc:url:{document_id}")
+    if not url:
+        raise FileNotFoundError(f"{source} not found and no archived copy yet for '{document_id}'")
+    return url
+
+
+def _fetch_reused(namespace, document_id, vector_ids, previous):
+    """
+    Stored values, metadata and text of unchanged pages' vectors
+    Raises if any are gone, after saving the manifest without page hashes
+    so the retry re-embeds every page (and still deletes the old ids).
+    """
+    if not vector_ids:
+        return {}
+    with timed("reuse_fetch"):
+        found = vector_store.fetch(vector_ids, namespace)
+        texts = load_chunk_texts(document_id, vector_ids) if CHUNK_TEXT_STORE == "redis" or HYBRID_SEARCH else {}
+
+    missing = len(vector_ids) - len(found)
+    if missing:
+        save_page_manifest(document_id, {**previous, "pages": [{**page, "hash": None} for page in previous["pages"]]})
+        raise RuntimeError(f"{missing} vectors in the page manifest of '{document_id}' are missing from the index")
+
+    for vector_id, vector in found.items():
+        vector["text"] = texts.get(vector_id) or vector["metadata"].get("text", "")
+    return found
+
+
+def _invalidate_revised(document_id, use_case, previous, file_hash):
+    """
+    Drop answers cached for the previous revision and its file hash
+    mapping, in Redis and in every API process's local cache (which also
+    holds the old BM25 index and invoice fields). Multi-document chats
+    that included the document (scopes:{document_id}) are dropped too.
+    """
+    scopes_key = f"scopes:{document_id}"
+    scopes = [document_id, *redis_client.smembers(scopes_key)]
+    keys = [scopes_key]
+    for scope in scopes:
+        keys += [f"qindex:{scope}", *redis_client.scan_iter(match=f"query:{scope}:*", count=1000)]
+    if previous["file_hash"] and previous["file_hash"] != file_hash:
+        keys.append(f"pdf:hash:{use_case}:{previous['file_hash']}")
+    redis_client.delete(*keys)
+    publish_invalidation(
+        keys=[*keys, bm25_key(f"{use_case}:{document_id}"), field_store_key(document_id)],
+        prefixes=[f"query:{scope}:" for scope in scopes]
+    )
+
+
+@timed_function("ingest")
+def ingest_pipeline(source, use_case, document_id, filename=None, cleanup_on_failure=True, file_hash=None):
+    """
+    Streamed ingestion: load -> chunk -> embed -> upsert
+
+    Each stage runs in its own thread connected by small bounded queues,
+    so page extraction, chunking, embedding batches and vector upserts
+    overlap instead of running one after another for the whole document.
+
+    source is normally the upload spooled to local disk (removed once
+    ingestion finishes), but a remote URL also works.
+
+    Ingesting a new revision under an existing document_id is
+    incremental: pages whose text hash is in the previous page manifest
+    keep their vectors (fetched, not re-embedded), only new or changed
+    pages are chunked and embedded, and vectors of pages that are gone
+    are deleted once the revision is in.
+    """
     namespace = f"{use_case}:{document_id}"
     redis_client.set(f"ingest:{document_id}", "PROCESSING")
+    file_url = _resolve_source(source, document_id)
+
+    chunker = PageChunker(use_case)
+    chunking = [EMBEDDING_MODEL, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, chunker.cross_page]
+    previous = load_page_manifest(document_id)
+    if previous and previous["use_case"] != use_case:
+        previous = None
+    # Cross-page chunks depend on their neighbours, so only per-page chunks are reused
+    reusable = (
+        {page["hash"]: page["vectors"] for page in previous["pages"] if page["hash"]}
+        if previous and previous["chunking"] == chunking and not chunker.cross_page else {}
+    )
+    page_hashes = []
+    page_vectors = {}
+    kept = set()
+    if previous:
+        # API processes may hold DONE for this document locally
+        publish_invalidation(keys=[f"ingest:{document_id}"])
+
+    pages = queue.Queue(maxsize=INGEST_STAGE_QUEUE_SIZE)
+    chunk_batches = queue.Queue(maxsize=INGEST_STAGE_QUEUE_SIZE)
+    vector_batches = queue.Queue(maxsize=INGEST_STAGE_QUEUE_SIZE)
+    failed = threading.Event()
+    errors = []
+    total = {"vectors": 0, "next_id": previous["next_id"] if previous else 0}
+    progress = {"page_count": 0, "last_page": 0, "percent": 0}
+    progress_lock = threading.Lock()
+
+    def report_progress(batch):
+        """Write PROCESSING:{percent} to the status key as upserted pages advance"""
+        with progress_lock:
+            progress["last_page"] = max(progress["last_page"], *(v["metadata"]["page_end"] for v in batch))
+            if not progress["page_count"]:
+                return
+            # 100% is only reported as DONE
+            percent = min(99, 100 * progress["last_page"] // progress["page_count"])
+            if percent <= progress["percent"]:
+                return
+            progress["percent"] = percent
+        redis_client.set(f"ingest:{document_id}", f"PROCESSING:{percent}")
+
+    upserter = BatchUpserter(namespace, document_id, on_progress=report_progress)
+    # Lexical index over the same chunks, saved once every vector is in
+    bm25 = BM25Builder(source=filename or file_url) if HYBRID_SEARCH else None
+    # Invoice fields are extracted from the page text (reused pages included)
+    fields = InvoiceFieldExtractor() if use_case == "invoice" else None
+
+    def load_stage():
+        try:
+            for page in timed_iter("load", iter_pdf_pages(file_url)):
+                progress["page_count"] = page["page_count"]
+                page["hash"] = page_hash(page["text"])
+                page_hashes.append(page["hash"])
+                if not _put(pages, page, failed):
+                    return
+        finally:
+            _put(pages, _END, failed)
+
+    def chunk_stage():
+        def send(batch, final=False):
+            """Pass on full embedding batches (and the remainder when final); None if aborted"""
+            while len(batch) >= INGEST_EMBED_BATCH_SIZE or (final and batch):
+                if not _put(chunk_batches, batch[:INGEST_EMBED_BATCH_SIZE], failed):
+                    return None
+                batch = batch[INGEST_EMBED_BATCH_SIZE:]
+            return batch
 
-    text = load_pdf(file_url)
-    chunks_with_metadata = chunk_text(text, use_case)
-    
-    # Extract just the text for embedding
-    chunk_texts = [chunk["text"] for chunk in chunks_with_metadata]
-    embeddings = embed(chunk_texts)
-
-    vectors = [
-        {
-            "id": f"{document_id}_{i}",
-            "values": emb,
-            "metadata": {
-                "text": chunk_meta["text"],
-                "page": chunk_meta["page"],
-                "source": file_url,
-                "document_id": document_id
-            }
-        }
-        for i, (chunk_meta, emb) in enumerate(zip(chunks_with_metadata, embeddings))
+        batch = []
+        try:
+            while (page := _get(pages, failed)) is not _END:
+                if fields:
+                    fields.feed([page])
+                # An identical page appearing twice only reuses the old vectors once
+                reused = reusable.pop(page["hash"], None)
+                if reused is not None:
+                    page_num = page["page_number"]
+                    chunks = [{"id": vector_id, "page": page_num, "page_end": page_num} for vector_id in reused]
+                else:
+                    with timed("chunk"):
+                        chunks = chunker.feed(page)
+                batch = send(batch + chunks)
+                if batch is None:
+                    return
+            if not failed.is_set():
+                with timed("chunk"):
+                    chunks = chunker.flush()
+                send(batch + chunks, final=True)
+        finally:
+            _put(chunk_batches, _END, failed)
+
+    def embed_stage():
+        try:
+            while (batch := _get(chunk_batches, failed)) is not _END:
+                stored = _fetch_reused(namespace, document_id, [c["id"] for c in batch if "id" in c], previous)
+                fresh = [chunk["text"] for chunk in batch if "id" not in chunk]
+                with timed("embed"):
+                    embeddings = iter(embed_chunks(fresh) if fresh else ())
+                vectors = []
+                texts = {}
+                for chunk_meta in batch:
+                    metadata = {
+                        "page": chunk_meta["page"],
+                        "page_end": chunk_meta["page_end"],
+                        "source": filename or file_url,
+                        "document_id": document_id
+                    }
+                    if "id" in chunk_meta:
+                        vector_id = chunk_meta["id"]
+                        old = stored[vector_id]
+                        chunk_meta["text"] = old["text"]
+                        kept.add(vector_id)
+                        if CHUNK_TEXT_STORE != "redis":
+                            metadata["text"] = old["text"]
+                        # Same page in the same place under the same name - nothing to write
+                        if metadata != old["metadata"]:
+                            vectors.append({"id": vector_id, "values": old["values"], "metadata": metadata})
+                    else:
+                        vector_id = f"{document_id}_{total['next_id']}"
+                        total["next_id"] += 1
+                        # Text lives either once per document in Redis or in every vector's metadata
+                        # (BM25-only matches have no vector metadata, so hybrid mode needs Redis)
+                        if CHUNK_TEXT_STORE == "redis" or bm25:
+                            texts[vector_id] = chunk_meta["text"]
+                        if CHUNK_TEXT_STORE != "redis":
+                            metadata["text"] = chunk_meta["text"]
+                        vectors.append({"id": vector_id, "values": next(embeddings), "metadata": metadata})
+                    if bm25:
+                        bm25.add(vector_id, chunk_meta["text"], chunk_meta["page"], chunk_meta["page_end"])
+                    page_vectors.setdefault(chunk_meta["page"], []).append(vector_id)
+                if vectors and not _put(vector_batches, (vectors, texts), failed):
+                    return
+        finally:
+            _put(vector_batches, _END, failed)
+
+    def upsert_stage():
+        try:
+            while (item := _get(vector_batches, failed)) is not _END:
+                vectors, texts = item
+                # Texts first, so a vector is never visible without its text
+                with timed("redis"):
+                    save_chunk_texts(document_id, texts)
+                upserter.submit(vectors)
+        finally:
+            total["vectors"] = upserter.close()
+
+    threads = [
+        _run_stage(stage, errors, failed)
+        for stage in (load_stage, chunk_stage, embed_stage, upsert_stage)
     ]
+    for thread in threads:
+        thread.join()
+
+    if not errors or cleanup_on_failure:
+        remove_spooled(source)
+
+    if errors:
+        redis_client.set(f"ingest:{document_id}", "FAILED")
+        logger.error("❌ Ingestion failed for document ID '%s': %s", document_id, errors[0])
+        raise errors[0]
+
+    stale = [
+        vector_id for page in previous["pages"] for vector_id in page["vectors"] if vector_id not in kept
+    ] if previous else []
+    if stale:
+        vector_store.delete(stale, namespace)
+        delete_chunk_texts(document_id, stale)
+
+    if bm25:
+        with timed("bm25_build"):
+            save_bm25_index(namespace, bm25.build())
+    if fields:
+        with timed("invoice_fields"):
+            extracted = fields.finish()
+        save_invoice_fields(document_id, extracted)
+        logger.info("🧾 Extracted %d invoice fields for '%s'", len(extracted), document_id)
+
+    save_page_manifest(document_id, {
+        "file_hash": file_hash,
+        "use_case": use_case,
+        "chunking": chunking,
+        "next_id": total["next_id"],
+        "pages": [{"hash": h, "vectors": page_vectors.get(i, [])} for i, h in enumerate(page_hashes, 1)]
+    })
+    if previous:
+        _invalidate_revised(document_id, use_case, previous, file_hash)
+        logger.info("♻️ Revision of '%s': reused %d vectors, deleted %d stale", document_id, len(kept), len(stale))
 
-    upsert(vectors, namespace, document_id)
-    print(f"Ingestion pipeline completed for document ID '{document_id}' in namespace '{namespace}' with {len(vectors)} vectors.")
+    logger.info("Ingestion pipeline completed for document ID '%s' in namespace '%s' with %d vectors.", document_id, namespace, total["vectors"])
     redis_client.set(f"ingest:{document_id}", "DONE")
@@ -0,0 +1,147 @@
+import math
+from config.settings import CONTEXT_TOKEN_BUDGET, CONTEXT_DEDUP_THRESHOLD
+
+# Shortest suffix/prefix match treated as chunk overlap (not coincidence)
+MIN_OVERLAP_CHARS = 32
+SHINGLE_SIZE = 5
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token - close enough for budgeting LLM prompts"""
+    return math.ceil(len(text) / 4)
+
+
+def _overlap(a: str, b: str) -> int:
+    """Length of the longest suffix of a that is a prefix of b (0 if shorter than MIN_OVERLAP_CHARS)"""
+    head = b[:MIN_OVERLAP_CHARS]
+    if len(head) < MIN_OVERLAP_CHARS:
+        return 0
+    start = a.find(head)
+    while start != -1:
+        if b.startswith(a[start:]):
+            return len(a) - start
+        start = a.find(head, start + 1)
+    return 0
+
+
+def _adjacent(a: dict, b: dict) -> bool:
+    return a["document_id"] == b["document_id"] and b["page"] - a["page_end"] in (0, 1)
+
+
+def _shingles(text: str) -> set:
+    words = text.lower().split()
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+
+
+def _merge_overlapping(pieces: list[dict]) -> tuple[list[dict], int]:
+    """
+    Merge chunks from the same/adjacent pages whose text overlaps (the
+    splitter's chunk overlap) or is contained in another chunk; a merged
+    piece carries the sources of every chunk in it
+    """
+    merged = 0
+    result = []
+    for piece in sorted(pieces, key=lambda p: (p["document_id"], p["page"], p["page_end"])):
+        piece = {**piece, "sources": list(piece.get("sources", []))}
+        if result and _adjacent(result[-1], piece):
+            last = result[-1]
+            if piece["text"] in last["text"]:
+                last["score"] = max(last["score"], piece["score"])
+                last["sources"] += piece["sources"]
+                merged += 1
+                continue
+            if last["text"] in piece["text"]:
+                piece["score"] = max(last["score"], piece["score"])
+                piece["sources"] = last["sources"] + piece["sources"]
+                result[-1] = piece
+                merged += 1
+                continue
+            forward = _overlap(last["text"], piece["text"])
+            backward = 0 if forward else _overlap(piece["text"], last["text"])
+            if forward or backward:
+                if forward:
+                    text = last["text"] + piece["text"][forward:]
+                else:
+                    text = piece["text"] + last["text"][backward:]
+                result[-1] = {
+                    **last,
+                    "text": text,
+                    "page_end": max(last["page_end"], piece["page_end"]),
+                    "score": max(last["score"], piece["score"]),
+                    "sources": last["sources"] + piece["sources"]
+                }
+                merged += 1
+                continue
+        result.append(piece)
+    return result, merged
+
+
+def _drop_near_duplicates(pieces: list[dict], threshold: float) -> tuple[list[dict], int]:
+    """Keep the higher-scored of any two pieces whose word shingles overlap above threshold"""
+    kept = []
+    kept_shingles = []
+    dropped = 0
+    for piece in sorted(pieces, key=lambda p: p["score"], reverse=True):
+        shingles = _shingles(piece["text"])
+        if any(len(shingles & other) / len(shingles | other) >= threshold for other in kept_shingles):
+            dropped += 1
+            continue
+        kept.append(piece)
+        kept_shingles.append(shingles)
+    return kept, dropped
+
+
+def _label(piece: dict) -> str:
+    if piece["page_end"] != piece["page"]:
+        return f"[Page {piece['page']}-{piece['page_end']}]"
+    return f"[Page {piece['page']}]"
+
+
+def assemble_context(pieces: list[dict], budget: int = CONTEXT_TOKEN_BUDGET,
+                     dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD) -> tuple[str, dict, list]:
+    """
+    Build the LLM context from retrieved chunks
+
+    pieces: [{"text", "score", "page", "page_end", "document_id", "sources"}]
+    ("sources" is optional - a list of anything identifying the chunk)
+    1. merge overlapping/adjacent chunks from the same document and page
+    2. drop near-duplicates (word-shingle Jaccard >= dedup_threshold)
+    3. pack the highest-scored pieces into the token budget
+
+    Returns (context, stats, sources) where stats reports the tokens
+    saved and sources are those of the chunks that made it into the
+    context, in context order.
+    """
+    pieces = [p for p in pieces if p["text"]]
+    input_tokens = sum(estimate_tokens(p["text"]) for p in pieces)
+
+    pieces, merged = _merge_overlapping(pieces)
+    pieces, deduplicated = _drop_near_duplicates(pieces, dedup_threshold)
+
+    selected = []
+    sources = []
+    used = 0
+    dropped = 0
+    for piece in pieces:
+        block = f"{_label(piece)} {piece['text']}"
+        tokens = estimate_tokens(block)
+        if not selected and tokens > budget:
+            # Never send an empty context because the best piece alone is too long
+            block = block[:budget * 4]
+            tokens = estimate_tokens(block)
+        if used + tokens > budget:
+            dropped += 1
+            continue
+        selected.append(block)
+        sources += piece["sources"]
+        used += tokens
+
+    stats = {
+        "input_tokens": input_tokens,
+        "context_tokens": used,
+        "saved_tokens": max(0, input_tokens - used),
+        "merged": merged,
+        "deduplicated": deduplicated,
+        "dropped": dropped
+    }
+    return "\n\n".join(selected), stats, sources
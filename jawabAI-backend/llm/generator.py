@@ -1,10 +1,27 @@
-import google.generativeai as genai
+import asyncio
+import time
 from config.settings import GOOGLE_API_KEY
+from utils.lazy import Lazy
+from utils.metrics import timed, observe
 
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel("gemini-2.5-flash")
 
-def generate_answer(question, context, sources, use_case):
+def _make_model():
+    import google.generativeai as genai
+
+    genai.configure(api_key=GOOGLE_API_KEY)
+    return genai.GenerativeModel("gemini-2.5-flash")
+
+
+model = Lazy("gemini", _make_model)
+
+
+async def get_model():
+    """The Gemini client - imported and configured in a thread if warmup has not done it yet"""
+    if model.loaded:
+        return model.get()
+    return await asyncio.to_thread(model.get)
+
+def build_prompt(question, context, use_case):
     if use_case == "study":
         system_prompt = """You are a strict AI study assistant. Your ONLY purpose is to answer questions using EXCLUSIVELY the provided document context.
 
@@ -55,8 +72,30 @@ QUESTION/REQUEST:
 
 ANSWER:
 """
+    return prompt
+
+async def generate_answer(question, context, sources, use_case):
+    prompt = build_prompt(question, context, use_case)
 
-    response = model.generate_content(prompt)
+    # Native async Gemini call - does not hold the event loop while waiting
+    with timed("llm_generate"):
+        response = await (await get_model()).generate_content_async(prompt)
 
     return response.text.strip()
 
+
+async def stream_answer(question, context, use_case):
+    """Yield answer text as Gemini produces it"""
+    prompt = build_prompt(question, context, use_case)
+
+    # Timed with observe() rather than a span - the generator suspends at every yield
+    start = time.perf_counter()
+    first = True
+    response = await (await get_model()).generate_content_async(prompt, stream=True)
+    async for chunk in response:
+        if chunk.text:
+            if first:
+                observe("llm_first_token", time.perf_counter() - start)
+                first = False
+            yield chunk.text
+    observe("llm_stream", time.perf_counter() - start)
@@ -1,68 +1,173 @@
+import logging
+import re
+from bisect import bisect_right
+from functools import lru_cache
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from utils.lazy import Lazy
+from config.settings import EMBEDDING_MODEL, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, CHUNK_CROSS_PAGE
+
+logger = logging.getLogger(__name__)
+
+INVOICE_KEYWORDS = [
+    "invoice",
+    "bill to",
+    "vendor",
+    "total",
+    "tax",
+    "gst",
+    "amount",
+    "payment"
+]
+
+# All keywords matched in one case-insensitive pass per line
+_INVOICE_KEYWORDS = re.compile("|".join(map(re.escape, INVOICE_KEYWORDS)), re.IGNORECASE)
+
+
+def _load_tokenizer():
+    from transformers import AutoTokenizer
+
+    name = EMBEDDING_MODEL if "/" in EMBEDDING_MODEL else f"sentence-transformers/{EMBEDDING_MODEL}"
+    return AutoTokenizer.from_pretrained(name)
+
+
+tokenizer = Lazy("tokenizer", _load_tokenizer)
+
+
+def token_length(text: str) -> int:
+    """Length in embedding-model tokens (without [CLS]/[SEP])"""
+    return len(tokenizer.get().encode(text, add_special_tokens=False))
+
+
+@lru_cache(maxsize=4)
+def _get_splitter(chunk_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+    """Built once and reused - sized by tokens so chunks fit the embedder's window"""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_tokens,
+        chunk_overlap=overlap_tokens,
+        length_function=token_length
+    )
+
 
 #invoice chunking logic
 def invoice_chunker(pages: list) -> list[dict]:
     """Chunk invoice with page metadata"""
     sections = []
-    keywords = [
-        "invoice",
-        "bill to",
-        "vendor",
-        "total",
-        "tax",
-        "gst",
-        "amount",
-        "payment"
-    ]
-    
+    splitter = _get_splitter()
+
+    def add_section(text, page_num):
+        text = text.strip()
+        if not text:
+            return
+        # Keyword sections longer than the embedder window are split further
+        # instead of being silently truncated at encode time
+        parts = [text] if token_length(text) <= CHUNK_TOKENS else splitter.split_text(text)
+        sections.extend({"text": part, "page": page_num, "page_end": page_num} for part in parts)
+
     for page in pages:
         page_num = page["page_number"]
-        text = page["text"]
-        lines = text.split("\n")
-        buffer = ""
-
-        for line in lines:
-            buffer += line + " "
-            if any(k in line.lower() for k in keywords):
-                sections.append({
-                    "text": buffer.strip(),
-                    "page": page_num
-                })
-                buffer = ""
-
-        if buffer.strip():
-            sections.append({
-                "text": buffer.strip(),
-                "page": page_num
-            })
+        lines = page["text"].split("\n")
+        start = 0
+
+        for i, line in enumerate(lines):
+            if _INVOICE_KEYWORDS.search(line):
+                add_section(" ".join(lines[start:i + 1]), page_num)
+                start = i + 1
+
+        add_section(" ".join(lines[start:]), page_num)
 
     return sections
 
 
-def chunk_text(pages: list, use_case: str = "study") -> list[dict]:
+class PageChunker:
+    """
+    Incremental chunker fed one page at a time (used by the streamed ingest pipeline)
+
+    Per-page mode chunks each page on its own. In cross-page mode the last
+    chunk of what has been seen so far is held back and re-split together
+    with the next page, so chunks can continue across page boundaries while
+    the buffer never grows past roughly one page plus one chunk.
+    """
+
+    def __init__(self, use_case: str = "study", cross_page: bool = CHUNK_CROSS_PAGE):
+        self.use_case = use_case
+        self.cross_page = cross_page and use_case != "invoice"
+        self.splitter = _get_splitter()
+        self._text = ""
+        self._offsets = []  # start offset of each page in _text
+        self._page_numbers = []
+
+    def _split_page(self, page) -> list[dict]:
+        if self.use_case == "invoice":
+            return invoice_chunker([page])
+        page_num = page["page_number"]
+        return [
+            {"text": chunk, "page": page_num, "page_end": page_num}
+            for chunk in self.splitter.split_text(page["text"])
+        ]
+
+    def _page_at(self, offset: int) -> int:
+        return self._page_numbers[bisect_right(self._offsets, offset) - 1]
+
+    def _split_buffer(self) -> list[tuple[int, str]]:
+        """Split the buffered text into (start offset, chunk) pairs"""
+        pieces = []
+        start = -1
+        for chunk in self.splitter.split_text(self._text):
+            # Chunk starts strictly increase; overlap is in tokens, so search from the previous start
+            start = self._text.find(chunk, start + 1)
+            pieces.append((start, chunk))
+        return pieces
+
+    def _to_chunk(self, start: int, text: str) -> dict:
+        return {
+            "text": text,
+            "page": self._page_at(start),
+            "page_end": self._page_at(start + len(text) - 1)
+        }
+
+    def _rebase(self, start: int):
+        """Drop buffered text before start, keeping page offsets aligned"""
+        first = bisect_right(self._offsets, start) - 1
+        self._offsets = [0] + [o - start for o in self._offsets[first + 1:]]
+        self._page_numbers = self._page_numbers[first:]
+        self._text = self._text[start:]
+
+    def feed(self, page) -> list[dict]:
+        if not self.cross_page:
+            return self._split_page(page)
+        if not page["text"]:
+            return []
+
+        if self._text:
+            self._text += "\n\n"
+        self._offsets.append(len(self._text))
+        self._page_numbers.append(page["page_number"])
+        self._text += page["text"]
+
+        pieces = self._split_buffer()
+        if len(pieces) <= 1:
+            return []
+        chunks = [self._to_chunk(start, text) for start, text in pieces[:-1]]
+        self._rebase(pieces[-1][0])
+        return chunks
+
+    def flush(self) -> list[dict]:
+        if not self._text:
+            return []
+        chunks = [self._to_chunk(start, text) for start, text in self._split_buffer()]
+        self._text, self._offsets, self._page_numbers = "", [], []
+        return chunks
+
+
+def chunk_text(pages: list, use_case: str = "study", cross_page: bool = CHUNK_CROSS_PAGE) -> list[dict]:
     """Chunk text while preserving page metadata"""
-    print(f"Chunking text for use case: {use_case}")
-
-    if use_case == "invoice":
-        chunks = invoice_chunker(pages)
-    else:
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len
-        )
-        
-        chunks = []
-        for page in pages:
-            page_num = page["page_number"]
-            text = page["text"]
-            split_chunks = splitter.split_text(text)
-            
-            for chunk in split_chunks:
-                chunks.append({
-                    "text": chunk,
-                    "page": page_num
-                })
-    
-    print(f"Created {len(chunks)} chunks.")
+    logger.debug("Chunking text for use case: %s", use_case)
+
+    chunker = PageChunker(use_case, cross_page)
+    chunks = []
+    for page in pages:
+        chunks.extend(chunker.feed(page))
+    chunks.extend(chunker.flush())
+
+    logger.debug("Created %d chunks.", len(chunks))
     return chunks
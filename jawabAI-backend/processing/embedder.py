@@ -1,13 +1,171 @@
-from sentence_transformers import SentenceTransformer
+import logging
+import asyncio
+import os
+import numpy as np
+from utils.lazy import Lazy
+from config.settings import (
+    EMBEDDING_MODEL, EMBEDDING_BACKEND, EMBEDDING_BATCH_SIZE, EMBEDDING_ONNX_DIR, EMBEDDING_THREADS
+)
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
+logger = logging.getLogger(__name__)
+
+
+class TorchBackend:
+    """SentenceTransformer on PyTorch (CPU or CUDA)"""
+
+    def __init__(self, model_name: str):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if EMBEDDING_THREADS:
+            torch.set_num_threads(EMBEDDING_THREADS)
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.max_seq_length = self.model.max_seq_length
+        self.on_gpu = self.model.device.type == "cuda"
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=len(texts),
+            normalize_embeddings=True,
+            show_progress_bar=False,
+            convert_to_numpy=True
+        )
+
+
+class OnnxBackend:
+    """
+    MiniLM exported to ONNX and run with ONNX Runtime on CPU
+    With quantize=True the exported graph is dynamically quantized to int8.
+    The export/quantize step runs once and is cached in EMBEDDING_ONNX_DIR.
+    """
+
+    def __init__(self, model_name: str, quantize: bool = False):
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+            from optimum.exporters.onnx import main_export
+        except ImportError as e:
+            raise RuntimeError(
+                "ONNX embedding backend requires: pip install onnxruntime optimum[onnxruntime]"
+            ) from e
+
+        hf_name = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        export_dir = os.path.join(EMBEDDING_ONNX_DIR, hf_name.split("/")[-1])
+        model_path = os.path.join(export_dir, "model.onnx")
+
+        if not os.path.exists(model_path):
+            logger.info("Exporting %s to ONNX in %s...", hf_name, export_dir)
+            main_export(hf_name, output=export_dir, task="feature-extraction")
+
+        if quantize:
+            quantized_path = os.path.join(export_dir, "model.int8.onnx")
+            if not os.path.exists(quantized_path):
+                from onnxruntime.quantization import quantize_dynamic, QuantType
+                logger.info("Quantizing %s to int8...", model_path)
+                quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+            model_path = quantized_path
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if EMBEDDING_THREADS:
+            options.intra_op_num_threads = EMBEDDING_THREADS
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+        self.max_seq_length = 256
+        self.dim = self.session.get_outputs()[0].shape[-1]
+        self.on_gpu = False
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        tokens = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+        inputs = {k: v.astype(np.int64) for k, v in tokens.items() if k in self.input_names}
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        # Mean pooling over real tokens, then L2 normalize (same as SentenceTransformer)
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+
+def _auto_batch_size(on_gpu: bool) -> int:
+    """Larger batches amortize overhead on GPU; on CPU they mostly add padding"""
+    if on_gpu:
+        return 128
+    cpus = os.cpu_count() or 1
+    return 16 if cpus <= 2 else 32 if cpus <= 8 else 64
+
+
+class EmbeddingEngine:
+    """
+    Batched embedding engine
+
+    - Sorts inputs by length so each batch holds similar-length texts
+      (less padding per forward pass), then restores the original order
+    - Returns float32 NumPy arrays; conversion to lists only happens at
+      serialization time (e.g. the Pinecone request)
+    - backend "server" sends whole requests to the host's embedding
+      server, which does the sorting/batching with the one shared model
+    """
+
+    def __init__(self, backend: str = EMBEDDING_BACKEND, model_name: str = EMBEDDING_MODEL,
+                 batch_size: str = EMBEDDING_BATCH_SIZE):
+        self.model_name = model_name
+        self.backend_name = backend
+        if backend == "torch":
+            self.backend = TorchBackend(model_name)
+        elif backend in ("onnx", "onnx-int8"):
+            self.backend = OnnxBackend(model_name, quantize=backend == "onnx-int8")
+        elif backend == "server":
+            from processing.embedding_rpc import RemoteBackend
+            self.backend = RemoteBackend()
+            # Same vectors as the server's own backend, so cache keys match it
+            self.model_name = self.backend.model_name
+            self.backend_name = self.backend.backend_name
+        else:
+            raise ValueError(f"Unknown embedding backend: {backend}")
+
+        self.dim = self.backend.dim
+        if backend == "server":
+            # One request per call; the server re-batches across all clients
+            self.batch_size = 1 << 16
+        else:
+            self.batch_size = (
+                _auto_batch_size(self.backend.on_gpu) if batch_size == "auto" else int(batch_size)
+            )
+        logger.info("Embedding engine ready: %s on %s (batch_size=%d)", model_name, backend, self.batch_size)
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            out[idx] = self.backend.encode([texts[i] for i in idx])
+        return out
+
+
+# Loaded on first use (or by the startup warmup), not at import
+engine = Lazy("embedding_model", EmbeddingEngine)
+
+def get_engine() -> EmbeddingEngine:
+    return engine.get()
 
 def embed(chunks):
-    print(f"Generated embeddings for {len(chunks)} texts.")
-    return model.encode(
-        chunks,
-        normalize_embeddings=True,
-        show_progress_bar=True,
-        batch_size=2
-    ).tolist()
-    
+    logger.debug("Generated embeddings for %d texts.", len(chunks))
+    return get_engine().encode(chunks)
+
+async def aembed(chunks):
+    """Run the CPU-bound encode in a worker thread so the event loop stays free"""
+    return await asyncio.to_thread(embed, chunks)
@@ -0,0 +1,151 @@
+import logging
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from processing.embedder import embed, get_engine
+from storage.redis_client import redis_binary_client
+from utils.serialization import pack_vector, unpack_vector
+from utils.metrics import record_cache
+from utils.lazy import Lazy
+from config.settings import (
+    EMBEDDING_CACHE_BACKEND, EMBEDDING_CACHE_TTL, EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MAX_ENTRIES
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RedisEmbeddingStore:
+    """Vectors as raw float32/float16 bytes in Redis; TTL (plus the server's maxmemory policy) evicts"""
+
+    def __init__(self, ttl: int = EMBEDDING_CACHE_TTL):
+        self.redis = redis_binary_client
+        self.ttl = ttl
+
+    def get_many(self, keys: list[str]) -> list:
+        return self.redis.mget(keys)
+
+    def set_many(self, items: dict):
+        pipe = self.redis.pipeline(transaction=False)
+        for key, blob in items.items():
+            pipe.setex(key, self.ttl, blob)
+        pipe.execute()
+
+
+class DiskEmbeddingStore:
+    """Local SQLite store with LRU eviction by last access time and a TTL"""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+                 ttl: int = EMBEDDING_CACHE_TTL):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vec BLOB, accessed REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed)")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+
+    def get_many(self, keys: list[str]) -> list:
+        now = time.time()
+        with self.lock:
+            placeholders = ",".join("?" * len(keys))
+            rows = dict(self.db.execute(
+                f"SELECT key, vec FROM embeddings WHERE key IN ({placeholders}) AND accessed > ?",
+                [*keys, now - self.ttl]
+            ))
+            if rows:
+                self.db.executemany(
+                    "UPDATE embeddings SET accessed = ? WHERE key = ?",
+                    [(now, key) for key in rows]
+                )
+                self.db.commit()
+        return [rows.get(key) for key in keys]
+
+    def set_many(self, items: dict):
+        now = time.time()
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vec, accessed) VALUES (?, ?, ?)",
+                [(key, blob, now) for key, blob in items.items()]
+            )
+            self._evict(now)
+            self.db.commit()
+
+    def _evict(self, now: float):
+        self.db.execute("DELETE FROM embeddings WHERE accessed <= ?", (now - self.ttl,))
+        (count,) = self.db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if count > self.max_entries:
+            self.db.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+
+class EmbeddingCache:
+    """
+    Chunk embedding cache keyed by (model, sha256 of chunk text)
+
+    Only chunks that were never embedded before go through the model, so
+    re-ingesting an edited PDF or the same PDF under another use_case
+    mostly costs lookups.
+    """
+
+    def __init__(self, store, model_key: str, dim: int):
+        self.store = store
+        self.model_key = model_key
+        self.dim = dim
+
+    def key(self, text: str) -> str:
+        text_hash = hashlib.sha256(text.encode()).hexdigest()[:32]
+        return f"emb:{self.model_key}:{text_hash}"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        if not texts:
+            return out
+
+        keys = [self.key(t) for t in texts]
+        unique_keys = list(dict.fromkeys(keys))
+        blobs = dict(zip(unique_keys, self.store.get_many(unique_keys)))
+
+        # Embed each missing text once, even if it repeats in this batch
+        missing = {k: t for k, t in zip(keys, texts) if blobs[k] is None}
+        if missing:
+            vectors = embed(list(missing.values()))
+            new_blobs = {k: pack_vector(v) for k, v in zip(missing, vectors)}
+            self.store.set_many(new_blobs)
+            blobs.update(new_blobs)
+
+        for i, key in enumerate(keys):
+            out[i] = unpack_vector(blobs[key], self.dim)
+
+        hits = sum(key not in missing for key in keys)
+        record_cache("embedding", True, hits)
+        record_cache("embedding", False, len(keys) - hits)
+        logger.debug("Embedding cache: %d/%d chunks reused", hits, len(texts))
+        return out
+
+
+def _make_cache():
+    if EMBEDDING_CACHE_BACKEND == "off":
+        return None
+    store = DiskEmbeddingStore() if EMBEDDING_CACHE_BACKEND == "disk" else RedisEmbeddingStore()
+    engine = get_engine()
+    return EmbeddingCache(store, f"{engine.model_name}:{engine.backend_name}", engine.dim)
+
+
+# Needs the model's dimension, so it is built with the model on first use
+embedding_cache = Lazy("embedding_cache", _make_cache)
+
+def embed_chunks(texts: list[str]) -> np.ndarray:
+    """Embed ingestion chunks, going through the cache when enabled"""
+    cache = embedding_cache.get()
+    if cache is None:
+        return embed(texts)
+    return cache.embed(texts)
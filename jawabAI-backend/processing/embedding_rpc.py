@@ -0,0 +1,117 @@
+"""
+Wire protocol and client for the per-host embedding server (embedding_server.py)
+
+Frames are a 4-byte big-endian length followed by the body.
+- request:  packed {"op": "encode", "texts": [...]} or {"op": "info"}
+- response: one status byte, then
+    0x00 raw float32 vectors (n x dim, row-major)
+    0x01 packed info {"model", "backend", "dim", "max_seq_length"}
+    0x02 UTF-8 error message
+"""
+
+import socket
+import struct
+import threading
+import numpy as np
+from utils.serialization import pack, unpack
+from config.settings import EMBEDDING_SOCKET, EMBEDDING_SERVER_TIMEOUT
+
+_LENGTH = struct.Struct(">I")
+
+VECTORS = 0x00
+INFO = 0x01
+ERROR = 0x02
+
+
+def frame(body: bytes) -> bytes:
+    return _LENGTH.pack(len(body)) + body
+
+
+def _recv_exact(sock, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    while size:
+        received = sock.recv_into(view, size)
+        if not received:
+            raise ConnectionError("Embedding server closed the connection")
+        view = view[received:]
+        size -= received
+    return bytes(buffer)
+
+
+def recv_frame(sock) -> bytes:
+    (size,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    return _recv_exact(sock, size)
+
+
+async def read_frame(reader) -> bytes:
+    (size,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    return await reader.readexactly(size)
+
+
+class RemoteBackend:
+    """
+    Embedding backend that forwards encode calls to the host's embedding
+    server over a Unix socket
+
+    Every process on the host shares the server's single model copy, so
+    memory stays flat as API/ingest workers scale. Each thread keeps its
+    own connection; a dropped connection is re-opened once per call.
+    """
+
+    def __init__(self, socket_path: str = EMBEDDING_SOCKET, timeout: float = EMBEDDING_SERVER_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        try:
+            info = self._call({"op": "info"})
+        except OSError as e:
+            raise RuntimeError(
+                f"Embedding server not reachable at {socket_path} - start it with: python embedding_server.py"
+            ) from e
+        self.model_name = info["model"]
+        self.backend_name = info["backend"]
+        self.dim = info["dim"]
+        self.max_seq_length = info["max_seq_length"]
+        self.on_gpu = False
+
+    def _connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _call(self, request: dict):
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                sock.sendall(frame(pack(request)))
+                response = recv_frame(sock)
+                break
+            except (ConnectionError, BrokenPipeError):
+                self._close()
+                if attempt:
+                    raise
+            except OSError:
+                self._close()
+                raise
+
+        status, body = response[0], response[1:]
+        if status == ERROR:
+            raise RuntimeError(f"Embedding server error: {body.decode()}")
+        if status == INFO:
+            return unpack(body)
+        return body
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        body = self._call({"op": "encode", "texts": texts})
+        return np.frombuffer(body, dtype=np.float32).reshape(len(texts), self.dim)
@@ -0,0 +1,265 @@
+"""
+Invoice field extraction, run once per invoice at ingest time
+
+Rule/regex extractors run over each page's text as loaded, line breaks
+included: a value may sit on the line after its label, but free-text
+values (vendor, payment terms) never run on into the next line. Fields the
+rules miss can be filled by one optional LLM call. The result is
+{field: {"value", "page", "method"}} for every field that was found.
+"""
+
+import logging
+import json
+import re
+from config.settings import INVOICE_LLM_EXTRACTION, INVOICE_LLM_MAX_CHARS
+
+logger = logging.getLogger(__name__)
+
+FIELD_LABELS = {
+    "vendor": "Vendor",
+    "invoice_number": "Invoice Number",
+    "invoice_date": "Invoice Date",
+    "total": "Total",
+    "tax": "Tax",
+    "gstin": "GSTIN",
+    "payment_terms": "Payment Terms"
+}
+
+# Currency codes are upper case; a trailing % means a rate, not an amount
+_AMOUNT = r"((?:(?-i:[A-Z]{3})\s*|[₹$€£]\s*|rs\.?\s*)?\d[\d,]*(?:\.\d{1,2})?)(?!\d|\.\d|\s*%)"
+_DATE = (
+    r"(\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}|\d{4}-\d{2}-\d{2}"
+    r"|\d{1,2}\s+[A-Za-z]{3,9},?\s+\d{4}|[A-Za-z]{3,9}\s+\d{1,2},?\s+\d{4})"
+)
+
+# Per field, patterns in priority order - a higher-priority label wins
+# over a lower one; within one pattern the last match wins (a grand total
+# follows its subtotals)
+_RULES = {
+    "vendor": [
+        r"(?:vendor|seller|supplier|sold\s+by|billed\s+by)\s*(?:name)?\s*[:\-]\s*"
+        r"([A-Za-z0-9&.,'() ]{2,80}?)(?=[ \t]+(?:address|gstin|gst|invoice|date|phone|email|bill)\b|[ \t]*$)"
+    ],
+    "invoice_number": [
+        r"invoice\s*(?:no\.?|number|num|#|id)\s*[:#.\-]?\s*([A-Z0-9][A-Z0-9/\-]*\d[A-Z0-9/\-]*)"
+    ],
+    "invoice_date": [
+        r"invoice\s+date\s*[:\-]?\s*" + _DATE,
+        r"(?<!due\s)\bdate(?:d)?\s*[:\-]?\s*" + _DATE
+    ],
+    "total": [
+        r"(?:grand\s+total|total\s+amount\s+due|amount\s+due|balance\s+due)\s*(?:\([^)]*\))?\s*[:\-]?\s*" + _AMOUNT,
+        r"total\s+amount\s*(?:\([^)]*\))?\s*[:\-]?\s*" + _AMOUNT,
+        r"(?<!sub)(?<!sub-)(?<!sub\s)total\s*(?:\([^)]*\))?\s*[:\-]?\s*" + _AMOUNT
+    ],
+    "gstin": [
+        r"\b(\d{2}[A-Z]{5}\d{4}[A-Z][1-9A-Z]Z[0-9A-Z])\b"
+    ],
+    "payment_terms": [
+        r"(?:payment\s+terms|terms\s+of\s+payment)\s*[:\-]\s*([^.;:\n]{2,60}?)(?=[ \t]{2,}|[.;:]|[ \t]*$)",
+        r"\b(net\s*\d{1,3}(?:\s+days)?|due\s+on\s+receipt|cash\s+on\s+delivery|payable\s+within\s+\d{1,3}\s+days)\b"
+    ]
+}
+
+# Multi-line: "$" ends a free-text value at the end of its line
+_COMPILED = {
+    field: [re.compile(pattern, re.IGNORECASE | re.MULTILINE) for pattern in patterns]
+    for field, patterns in _RULES.items()
+}
+# GSTINs are upper case by definition - matching case-insensitively finds prose
+_COMPILED["gstin"] = [re.compile(pattern) for pattern in _RULES["gstin"]]
+
+# Tax is not a "last match wins" field: split GST lists CGST + SGST (or
+# IGST) separately, so an explicit total-tax label is preferred, then the
+# sum of the split components, then a single generic tax line
+_TAX_TOTAL = re.compile(
+    r"(?:total\s+tax|tax\s+amount|total\s+gst)\s*(?:\([^)]*\))?\s*[:\-]?\s*" + _AMOUNT, re.IGNORECASE
+)
+_TAX_COMPONENT = re.compile(
+    r"\b(igst|cgst|sgst|utgst|vat|gst|tax)\s*(?:@?\s*\d+(?:\.\d+)?\s*%)?\s*(?:\([^)]*\))?\s*[:\-]?\s*" + _AMOUNT,
+    re.IGNORECASE
+)
+_SPLIT_GST = {"cgst", "sgst", "utgst", "igst"}
+_NUMBER = re.compile(r"\d[\d,]*(?:\.\d{1,2})?")
+
+
+def _sum_amounts(values: list[str]) -> str:
+    """"90.00" + "90.00" -> "180.00", keeping a currency prefix the amounts share"""
+    total = 0.0
+    prefixes = set()
+    for value in values:
+        number = _NUMBER.search(value)
+        prefixes.add(value[:number.start()].strip())
+        total += float(number.group().replace(",", ""))
+    prefix = prefixes.pop() if len(prefixes) == 1 else ""
+    return f"{prefix} {total:,.2f}".strip() if prefix else f"{total:,.2f}"
+
+
+def _extract_tax(pages: dict):
+    """
+    Returns (field entry or None, ambiguous) - ambiguous when the tax lines
+    cannot be resolved to one amount (repeated components, e.g. per line
+    item, or a generic tax line mixed with split GST)
+    """
+    explicit = []
+    components = []
+    for page in sorted(pages):
+        text = pages[page]
+        explicit += [(page, m.group(1).strip(" ,:-")) for m in _TAX_TOTAL.finditer(text)]
+        components += [(page, m.group(1).lower(), m.group(2).strip(" ,:-")) for m in _TAX_COMPONENT.finditer(text)]
+
+    if explicit:
+        page, value = explicit[-1]
+        return {"value": value, "page": page, "method": "rule"}, False
+    if not components:
+        return None, False
+
+    labels = [label for _, label, _ in components]
+    page = components[-1][0]
+    if len(labels) != len(set(labels)):
+        return None, True
+    if set(labels) <= _SPLIT_GST:
+        if len(labels) == 1:
+            return {"value": components[0][2], "page": page, "method": "rule"}, False
+        return {"value": _sum_amounts([value for _, _, value in components]), "page": page, "method": "rule_sum"}, False
+    if len(labels) == 1:
+        return {"value": components[0][2], "page": page, "method": "rule"}, False
+    return None, True
+
+
+class InvoiceFieldExtractor:
+    """Fed loaded pages during ingestion; finish() returns the extracted fields"""
+
+    def __init__(self, use_llm: bool = INVOICE_LLM_EXTRACTION):
+        self.use_llm = use_llm
+        self.pages = {}
+        # Fields whose rule matches conflict - left for the chat LLM to read in context
+        self.ambiguous = set()
+
+    def feed(self, pages: list[dict]):
+        """Loader pages ({"page_number", "text"}) - the text, not chunks, so line breaks survive"""
+        for page in pages:
+            self.pages[page["page_number"]] = page["text"]
+
+    def _apply_rules(self) -> dict:
+        fields = {}
+        ranks = {}
+        for page in sorted(self.pages):
+            text = self.pages[page]
+            for field, patterns in _COMPILED.items():
+                for rank, pattern in enumerate(patterns):
+                    if rank > ranks.get(field, len(patterns)):
+                        break
+                    found = [m.group(1).strip(" ,:-") for m in pattern.finditer(text)]
+                    found = [value for value in found if value]
+                    if found:
+                        fields[field] = {"value": found[-1], "page": page, "method": "rule"}
+                        ranks[field] = rank
+                        break
+
+        tax, ambiguous = _extract_tax(self.pages)
+        if tax:
+            fields["tax"] = tax
+        if ambiguous:
+            self.ambiguous.add("tax")
+        return fields
+
+    def _apply_llm(self, fields: dict) -> dict:
+        """One Gemini call for the fields the rules missed; extraction still succeeds without it"""
+        missing = [field for field in FIELD_LABELS if field not in fields and field not in self.ambiguous]
+        if not missing:
+            return fields
+
+        text = "\n".join(
+            f"[Page {page}] {page_text}" for page, page_text in sorted(self.pages.items())
+        )[:INVOICE_LLM_MAX_CHARS]
+        prompt = (
+            "Extract these fields from the invoice text below. Reply with one JSON object "
+            f"whose keys are {json.dumps(missing)}; each value is an object "
+            '{"value": exact text from the invoice, "page": page number}, or null if the field is not present. '
+            "Do not guess or calculate.\n\nINVOICE:\n" + text
+        )
+        try:
+            from llm.generator import model
+            reply = model.get().generate_content(prompt).text
+            parsed = json.loads(reply[reply.find("{"):reply.rfind("}") + 1])
+        except Exception as e:
+            logger.warning("⚠️ LLM invoice field extraction failed: %s", e)
+            return fields
+
+        for field in missing:
+            entry = parsed.get(field)
+            if isinstance(entry, dict) and entry.get("value"):
+                page = entry.get("page")
+                fields[field] = {
+                    "value": str(entry["value"]).strip(),
+                    "page": int(page) if isinstance(page, (int, float)) else None,
+                    "method": "llm"
+                }
+        return fields
+
+    def finish(self) -> dict:
+        fields = self._apply_rules()
+        if self.use_llm:
+            fields = self._apply_llm(fields)
+        return fields
+
+
+# Question wording -> fields it asks for, in the order they are consumed:
+# "gst number" is the GSTIN and "total tax" the tax before "gst" or
+# "total" alone are looked at
+_QUESTION_FIELDS = [
+    ("gstin", re.compile(r"\bgstin\b|\bgst\s*(?:id|no|number|registration)\b", re.IGNORECASE)),
+    ("invoice_number", re.compile(r"\binvoice\s*(?:no|number|num|#|id)\b", re.IGNORECASE)),
+    ("invoice_date", re.compile(r"(?<!due\s)\b(?:invoice\s+)?date\b|\bwhen\s+was\b.*\b(?:issued|invoiced)\b", re.IGNORECASE)),
+    ("payment_terms", re.compile(r"\b(?:payment\s+terms|terms\s+of\s+payment|due\s+date|payable\s+by)\b", re.IGNORECASE)),
+    ("tax", re.compile(r"\b(?:total\s+)?(?:tax|vat|gst|igst|cgst|sgst)(?:\s+amount)?\b", re.IGNORECASE)),
+    ("total", re.compile(r"\b(?:grand\s+)?total(?:\s+amount)?\b|\b(?:amount|balance)\s+due\b", re.IGNORECASE)),
+    ("vendor", re.compile(r"\b(?:vendor|seller|supplier|issued\s+by|billed\s+by|who\s+(?:sent|issued))\b", re.IGNORECASE))
+]
+_ALL_FIELDS = re.compile(r"\b(?:all\s+(?:the\s+)?(?:invoice\s+)?(?:fields|details)|key\s+(?:fields|details))\b", re.IGNORECASE)
+# Questions about something other than the stored value (rates, amounts in words)
+_NOT_A_FIELD = re.compile(r"\brate\b|\bpercent(?:age)?\b|%|\bin\s+words\b|\bwords\b", re.IGNORECASE)
+# Words a field lookup may contain besides the field itself - anything
+# else ("total number of items", "terms of the contract") goes to RAG
+_FILLER_WORDS = frozenset("""
+    a an the this that these those of on in for to from by at and or
+    what what's whats which who when where how much many is are was were be been
+    do does did can could would will please tell give show list find get
+    me my our we i you your us it its it's 's here there
+    invoice bill document pdf mentioned listed stated written given shown
+    amount value name owe owed pay paid payable due charged exactly
+""".split())
+_WORD = re.compile(r"[a-z']+|\d+")
+
+
+def requested_fields(question: str) -> list[str]:
+    """Fields a short factual question asks for ([] when it is not a field lookup)"""
+    if _NOT_A_FIELD.search(question):
+        return []
+    if _ALL_FIELDS.search(question):
+        rest = _ALL_FIELDS.sub(" ", question)
+        matched = list(FIELD_LABELS)
+    else:
+        rest = question
+        matched = []
+        for field, pattern in _QUESTION_FIELDS:
+            if pattern.search(rest):
+                matched.append(field)
+                rest = pattern.sub(" ", rest)
+        # "How much do I owe?" asks for the total, "how much tax ..." only for the tax
+        if not matched and re.search(r"\bhow\s+much\b", question, re.IGNORECASE):
+            matched.append("total")
+    if any(word not in _FILLER_WORDS for word in _WORD.findall(rest.lower())):
+        return []
+    return matched
+
+
+def format_fields(fields: dict, names: list[str]) -> str:
+    """ "Field: Value (Page n)" lines, matching the invoice prompt's answer format"""
+    lines = []
+    for name in names:
+        entry = fields[name]
+        page = f" (Page {entry['page']})" if entry.get("page") else ""
+        lines.append(f"{FIELD_LABELS[name]}: {entry['value']}{page}")
+    return "\n".join(lines)
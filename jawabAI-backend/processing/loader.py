@@ -1,7 +1,14 @@
+import logging
+import multiprocessing
 import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
 import fitz
 import requests
-from io import BytesIO
+from config.settings import LOADER_WORKERS, LOADER_PARALLEL_MIN_PAGES, LOADER_PAGES_PER_TASK
+
+logger = logging.getLogger(__name__)
 
 # def load_pdf(source: str) -> list:
 #     """Load PDF and return list of pages with content and page number"""
@@ -24,27 +31,92 @@ from io import BytesIO
 #     return pages
 
 
-def load_pdf(source: str) -> list:
-    """Load PDF and return list of pages with content and page number"""
-    print(f"Loading data from {source}...")
-    if source.startswith("http"):
-        response = requests.get(source, timeout=20)
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Shared extraction pool, created on first use (spawn: safe from threaded workers)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=LOADER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+    return _pool
+
+
+def _extract_page_range(path: str, start: int, end: int) -> list:
+    """Runs in a pool process - extract pages [start, end) from the file on disk"""
+    with fitz.open(path) as doc:
+        return [
+            {"page_number": i + 1, "page_count": doc.page_count, "text": doc[i].get_text().strip()}
+            for i in range(start, end)
+        ]
+
+
+def _spool_download(url: str) -> str:
+    """Stream a remote PDF to a temp file instead of holding it in memory"""
+    with requests.get(url, timeout=20, stream=True) as response:
         response.raise_for_status()
-        file_stream = BytesIO(response.content)
-        doc = fitz.open(stream=file_stream, filetype="pdf")
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            for block in response.iter_content(chunk_size=1024 * 1024):
+                f.write(block)
+            return f.name
+
+
+def iter_pdf_pages(source: str):
+    """
+    Yield pages one at a time as {page_number, page_count, text} so downstream stages can start early
+
+    Remote files are spooled to a temp file (PyMuPDF reads it from disk on
+    demand). Large documents are split into page ranges extracted in a
+    process pool; ranges are yielded in page order as they complete.
+    """
+    logger.info("Loading data from %s...", source)
+    spooled = None
+    if source.startswith("http"):
+        spooled = path = _spool_download(source)
     else:
         if not os.path.exists(source):
             raise FileNotFoundError(f"{source} not found")
-        doc = fitz.open(source)
-
-    pages = []
-    for page_num, page in enumerate(doc, 1):
-        text = page.get_text()
-        pages.append({
-            "page_number": page_num,
-            "text": text.strip()
-        })
-    
+        path = source
+
+    try:
+        with fitz.open(path) as doc:
+            page_count = doc.page_count
+
+            if page_count < LOADER_PARALLEL_MIN_PAGES or LOADER_WORKERS <= 1:
+                for page_num, page in enumerate(doc, 1):
+                    yield {
+                        "page_number": page_num,
+                        "page_count": page_count,
+                        "text": page.get_text().strip()
+                    }
+                return
+
+        ranges = [
+            (start, min(start + LOADER_PAGES_PER_TASK, page_count))
+            for start in range(0, page_count, LOADER_PAGES_PER_TASK)
+        ]
+        results = _get_pool().map(
+            _extract_page_range,
+            [path] * len(ranges),
+            [start for start, _ in ranges],
+            [end for _, end in ranges]
+        )
+        for pages in results:
+            yield from pages
+    finally:
+        if spooled:
+            os.remove(spooled)
+
+
+def load_pdf(source: str) -> list:
+    """Load PDF and return list of pages with content and page number"""
+    pages = list(iter_pdf_pages(source))
+
     total_chars = sum(len(p["text"]) for p in pages)
-    print(f"TOTAL EXTRACTED CHARS: {total_chars} from {len(pages)} pages")
+    logger.info("TOTAL EXTRACTED CHARS: %d from %d pages", total_chars, len(pages))
     return pages
@@ -0,0 +1,72 @@
+import asyncio
+from processing.embedder import embed
+from config.settings import QUERY_EMBED_MAX_BATCH_SIZE, QUERY_EMBED_MAX_WAIT_MS
+
+
+class QueryEmbeddingBatcher:
+    """
+    Cross-request micro-batching for query embeddings
+
+    Each caller awaits embed(text). A single background task collects the
+    texts that arrive within max_wait_ms (up to max_batch_size), encodes
+    them in one forward pass in a worker thread and resolves every
+    caller's future with its own vector. While a batch is encoding, new
+    requests keep queueing, so batches grow naturally under load.
+    """
+
+    def __init__(self, max_batch_size: int = QUERY_EMBED_MAX_BATCH_SIZE,
+                 max_wait_ms: float = QUERY_EMBED_MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._worker = None
+
+    async def embed(self, text: str):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+        future = loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    def depth(self) -> int:
+        """Queries waiting for the next batch"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _collect(self):
+        """Wait for the first request, then gather more until full or max_wait expires"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await asyncio.to_thread(embed, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+
+# Global instance
+query_batcher = QueryEmbeddingBatcher()
@@ -0,0 +1,33 @@
+import asyncio
+
+
+class VectorStore:
+    """
+    Common interface for vector backends used by ingest_pipeline and chat
+
+    upsert(vectors, namespace, document_id)
+        vectors: [{"id", "values", "metadata"}]
+    query(vector, namespace, top_k, document_id)
+        returns {"matches": [{"id", "score", "metadata"}]} (or Pinecone's
+        QueryResponse, which exposes the same fields as attributes)
+    fetch(ids, namespace)
+        returns {id: {"values", "metadata"}} for the ids that exist
+    delete(ids, namespace)
+        removes vectors by id (used when a revision drops chunks)
+    """
+
+    def upsert(self, vectors, namespace, document_id):
+        raise NotImplementedError
+
+    def query(self, vector, namespace, top_k=5, document_id=None):
+        raise NotImplementedError
+
+    def fetch(self, ids, namespace):
+        raise NotImplementedError
+
+    def delete(self, ids, namespace):
+        raise NotImplementedError
+
+    async def aquery(self, vector, namespace, top_k=5, document_id=None):
+        """Backends are blocking by default - run them in a worker thread"""
+        return await asyncio.to_thread(self.query, vector, namespace, top_k, document_id)
@@ -0,0 +1,81 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from retrieval.vector_store import vector_store
+from utils.metrics import timed
+from config.settings import (
+    UPSERT_BATCH_SIZE, UPSERT_CONCURRENCY, UPSERT_MAX_RETRIES, UPSERT_RETRY_BACKOFF
+)
+
+logger = logging.getLogger(__name__)
+
+
+class BatchUpserter:
+    """
+    Sends vectors to the vector store in fixed-size batches over a bounded
+    pool of concurrent requests
+
+    - submit() blocks once `concurrency` batches are in flight (backpressure
+      on the embedding stage instead of an unbounded backlog)
+    - each batch is retried with exponential backoff + jitter, so one
+      failed request does not lose the whole document
+    - on_progress(vectors) is called after every successful batch
+    """
+
+    def __init__(self, namespace: str, document_id: str, on_progress=None,
+                 batch_size: int = UPSERT_BATCH_SIZE, concurrency: int = UPSERT_CONCURRENCY,
+                 max_retries: int = UPSERT_MAX_RETRIES, backoff: float = UPSERT_RETRY_BACKOFF):
+        self.namespace = namespace
+        self.document_id = document_id
+        self.on_progress = on_progress
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.pool = ThreadPoolExecutor(max_workers=concurrency)
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.futures = []
+        self.upserted = 0
+        self._lock = threading.Lock()
+
+    def _send(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                with timed("upsert"):
+                    vector_store.upsert(batch, self.namespace, self.document_id)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                delay += random.uniform(0, delay)
+                logger.warning("⚠️ Upsert of %d vectors failed (%s); retrying in %.1fs", len(batch), e, delay)
+                time.sleep(delay)
+
+        with self._lock:
+            self.upserted += len(batch)
+        if self.on_progress:
+            self.on_progress(batch)
+
+    def _raise_if_failed(self):
+        for future in self.futures:
+            if future.done() and future.exception():
+                raise future.exception()
+
+    def submit(self, vectors: list[dict]):
+        for start in range(0, len(vectors), self.batch_size):
+            self._raise_if_failed()
+            self.slots.acquire()
+            future = self.pool.submit(self._send, vectors[start:start + self.batch_size])
+            future.add_done_callback(lambda _: self.slots.release())
+            self.futures.append(future)
+
+    def close(self) -> int:
+        """Wait for every batch; raises the first failure. Returns vectors upserted."""
+        try:
+            for future in self.futures:
+                future.result()
+        finally:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+        return self.upserted
@@ -0,0 +1,202 @@
+"""
+Per-namespace BM25 index for exact lookups (invoice numbers, GST IDs, totals)
+
+Built once per document during ingestion and stored in Redis as one
+compressed NumPy archive (bm25:{namespace}):
+- terms / ids: newline-joined UTF-8 blobs
+- offsets, docs, tfs: CSR postings - term i's postings are
+  docs[offsets[i]:offsets[i + 1]] with term frequencies in tfs
+- doc_len, pages: per-chunk token count and (page, page_end)
+Loaded indexes are kept in-process so repeated chats skip Redis.
+"""
+
+import asyncio
+import io
+import re
+import numpy as np
+from storage.redis_client import redis_binary_client, async_redis_binary_client
+from utils.ttl_cache import TTLCache
+from config.settings import BM25_K1, BM25_B, BM25_CACHE_MAX_INDEXES, BM25_CACHE_TTL
+
+# Keeps "INV-2023/045", "27AAPFU0939F1ZV" and "1,234.56" as single tokens
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.,/:-][a-z0-9]+)*")
+_PART_RE = re.compile(r"[a-z0-9]+")
+
+_loaded = TTLCache("bm25", maxsize=BM25_CACHE_MAX_INDEXES, ttl=BM25_CACHE_TTL)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased tokens; compound tokens also emit their parts so "INV-2023" matches "2023" """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = _PART_RE.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def bm25_key(namespace: str) -> str:
+    return f"bm25:{namespace}"
+
+
+class BM25Builder:
+    """Collects chunks during ingestion; build() freezes them into a BM25Index"""
+
+    def __init__(self, source: str = ""):
+        self.source = source
+        self.ids = []
+        self.pages = []
+        self.doc_len = []
+        self.postings = {}
+
+    def add(self, vector_id: str, text: str, page: int, page_end: int):
+        doc = len(self.ids)
+        tokens = tokenize(text)
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            self.postings.setdefault(token, []).append((doc, tf))
+        self.ids.append(vector_id)
+        self.pages.append((page, page_end))
+        self.doc_len.append(len(tokens))
+
+    def build(self) -> "BM25Index":
+        terms = sorted(self.postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        docs = []
+        tfs = []
+        for i, term in enumerate(terms):
+            postings = self.postings[term]
+            offsets[i + 1] = offsets[i] + len(postings)
+            docs.extend(doc for doc, _ in postings)
+            tfs.extend(tf for _, tf in postings)
+        return BM25Index(
+            terms=terms,
+            ids=self.ids,
+            offsets=offsets,
+            docs=np.asarray(docs, dtype=np.int32),
+            tfs=np.minimum(np.asarray(tfs, dtype=np.int64), np.iinfo(np.uint16).max).astype(np.uint16),
+            doc_len=np.asarray(self.doc_len, dtype=np.float32),
+            pages=np.asarray(self.pages, dtype=np.int32).reshape(-1, 2),
+            source=self.source
+        )
+
+
+class BM25Index:
+    def __init__(self, terms, ids, offsets, docs, tfs, doc_len, pages, source=""):
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.ids = ids
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.pages = pages
+        self.source = source
+        self.avg_len = float(doc_len.mean()) if len(doc_len) else 0.0
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory footprint (for the in-process cache's byte budget)"""
+        arrays = (self.offsets, self.docs, self.tfs, self.doc_len, self.pages)
+        strings = sum(len(term) + 64 for term in self.term_ids) + sum(len(i) + 50 for i in self.ids)
+        return sum(a.nbytes for a in arrays) + strings
+
+    def search(self, query: str, top_k: int = 5, k1: float = BM25_K1, b: float = BM25_B) -> list[tuple[int, float]]:
+        """[(doc index, score)] best first; only chunks sharing a term with the query"""
+        if not len(self):
+            return []
+        n = len(self)
+        scores = np.zeros(n, dtype=np.float32)
+        norm = k1 * (1 - b + b * self.doc_len / max(self.avg_len, 1e-9))
+        for term in set(tokenize(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.docs[start:end]
+            tfs = self.tfs[start:end].astype(np.float32)
+            idf = np.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tfs * (k1 + 1) / (tfs + norm[docs])
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > top_k:
+            hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+        hits = hits[np.argsort(-scores[hits])]
+        return [(int(i), float(scores[i])) for i in hits]
+
+    def matches(self, query: str, top_k: int, document_id: str) -> list[dict]:
+        """search() in the same {"id", "score", "metadata", "document_id"} shape as normalize_matches"""
+        results = []
+        for i, score in self.search(query, top_k):
+            page, page_end = self.pages[i]
+            results.append({
+                "id": self.ids[i],
+                "score": score,
+                "metadata": {
+                    "page": int(page),
+                    "page_end": int(page_end),
+                    "source": self.source,
+                    "document_id": document_id
+                },
+                "document_id": document_id
+            })
+        return results
+
+    def to_bytes(self) -> bytes:
+        terms = sorted(self.term_ids, key=self.term_ids.get)
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            terms=np.frombuffer("\n".join(terms).encode(), dtype=np.uint8),
+            ids=np.frombuffer("\n".join(self.ids).encode(), dtype=np.uint8),
+            source=np.frombuffer(self.source.encode(), dtype=np.uint8),
+            offsets=self.offsets,
+            docs=self.docs,
+            tfs=self.tfs,
+            doc_len=self.doc_len,
+            pages=self.pages
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "BM25Index":
+        data = np.load(io.BytesIO(blob), allow_pickle=False)
+
+        def strings(name):
+            text = data[name].tobytes().decode()
+            return text.split("\n") if text else []
+
+        return cls(
+            terms=strings("terms"),
+            ids=strings("ids"),
+            offsets=data["offsets"],
+            docs=data["docs"],
+            tfs=data["tfs"],
+            doc_len=data["doc_len"],
+            pages=data["pages"],
+            source=data["source"].tobytes().decode()
+        )
+
+
+def save_bm25_index(namespace: str, index: BM25Index):
+    redis_binary_client.set(bm25_key(namespace), index.to_bytes())
+    _loaded.set(bm25_key(namespace), index)
+
+
+async def load_bm25_index(namespace: str):
+    """The namespace's index, or None for documents ingested before hybrid search"""
+    key = bm25_key(namespace)
+    index = _loaded.get(key)
+    if index is None:
+        blob = await async_redis_binary_client.get(key)
+        if blob is None:
+            return None
+        # Decompressing and rebuilding the postings is CPU work - keep it off the event loop
+        index = await asyncio.to_thread(BM25Index.from_bytes, blob)
+        _loaded.set(key, index)
+    return index
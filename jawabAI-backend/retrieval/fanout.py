@@ -0,0 +1,112 @@
+import asyncio
+import heapq
+from retrieval.vector_store import vector_store
+from retrieval.bm25 import load_bm25_index
+from utils.metrics import timed
+from config.settings import CHAT_TOP_K, MULTI_DOC_QUOTA, HYBRID_SEARCH, HYBRID_CANDIDATES, RRF_K
+
+
+def normalize_matches(results, document_id: str) -> list[dict]:
+    """
+    Turn a Pinecone QueryResponse (Match objects) or a local store dict into
+    [{"id", "score", "metadata", "document_id"}] sorted by score
+    """
+    matches = results.matches if hasattr(results, 'matches') else results.get("matches", [])
+    normalized = []
+    for match in matches:
+        # Handle both object attributes and dict access
+        if hasattr(match, 'metadata'):
+            match_id, score, metadata = match.id, match.score, match.metadata
+        else:
+            match_id, score, metadata = match.get("id"), match.get("score", 0), match.get("metadata")
+        normalized.append({
+            "id": match_id,
+            "score": score or 0,
+            "metadata": dict(metadata or {}),
+            "document_id": document_id
+        })
+    normalized.sort(key=lambda m: m["score"], reverse=True)
+    return normalized
+
+
+def ranking_score(match: dict) -> float:
+    """What matches are ordered by: the fused score in hybrid mode, otherwise score"""
+    return match.get("fused_score", match["score"])
+
+
+def reciprocal_rank_fusion(rankings: list[list[dict]], k: int = RRF_K) -> list[dict]:
+    """
+    Fuse several rankings of the same chunks: fused_score = sum(1 / (k + rank))
+
+    Only ranks matter, so BM25 and cosine scores never need calibrating
+    against each other. A match keeps the metadata of the first ranking
+    it appears in; "score" stays the first (dense) ranking's cosine, and
+    is None for matches only the other rankings found.
+    """
+    fused = {}
+    for i, ranking in enumerate(rankings):
+        for rank, match in enumerate(ranking, start=1):
+            entry = fused.get(match["id"])
+            if entry is None:
+                entry = fused[match["id"]] = {**match, "score": match["score"] if i == 0 else None, "fused_score": 0.0}
+            entry["fused_score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=ranking_score, reverse=True)
+
+
+async def _vector_query(vector, namespace: str, document_id: str, top_k: int) -> list[dict]:
+    with timed("vector_query"):
+        results = await vector_store.aquery(vector, namespace, top_k=top_k, document_id=document_id)
+    return normalize_matches(results, document_id)
+
+
+async def _query_document(vector, question, namespace: str, document_id: str, top_k: int) -> list[dict]:
+    """Dense matches for one namespace, fused with its BM25 matches in hybrid mode"""
+    if not (HYBRID_SEARCH and question):
+        return await _vector_query(vector, namespace, document_id, top_k)
+
+    candidates = max(top_k, HYBRID_CANDIDATES)
+    dense, index = await asyncio.gather(
+        _vector_query(vector, namespace, document_id, candidates),
+        load_bm25_index(namespace)
+    )
+    if index is None:
+        return dense[:top_k]
+    with timed("bm25_search"):
+        lexical = await asyncio.to_thread(index.matches, question, candidates, document_id)
+    return reciprocal_rank_fusion([dense, lexical])[:top_k]
+
+
+async def query_documents(vector, use_case: str, document_ids: list[str],
+                          top_k: int = CHAT_TOP_K, per_doc_quota: int = MULTI_DOC_QUOTA,
+                          question: str = None) -> list[dict]:
+    """
+    Query each document's namespace concurrently and merge into one ranking
+
+    Latency tracks the slowest namespace rather than the sum. Results are
+    merged by score with a heap, and no document contributes more than
+    per_doc_quota matches so one large textbook cannot crowd out the rest.
+    With HYBRID_SEARCH and a question, each namespace's dense matches are
+    fused with its BM25 matches (reciprocal-rank fusion) first.
+    """
+    if len(document_ids) == 1:
+        per_doc_quota = top_k
+
+    per_doc_k = min(top_k, per_doc_quota)
+    results = await asyncio.gather(*(
+        _query_document(vector, question, f"{use_case}:{document_id}", document_id, per_doc_k)
+        for document_id in document_ids
+    ))
+
+    ranked = heapq.merge(*results, key=lambda m: -ranking_score(m))
+
+    merged = []
+    taken = {}
+    for match in ranked:
+        document_id = match["document_id"]
+        if taken.get(document_id, 0) >= per_doc_quota:
+            continue
+        taken[document_id] = taken.get(document_id, 0) + 1
+        merged.append(match)
+        if len(merged) == top_k:
+            break
+    return merged
@@ -0,0 +1,276 @@
+import logging
+import json
+import os
+import threading
+import numpy as np
+from retrieval.base import VectorStore
+from config.settings import VECTOR_STORE_DIR, LOCAL_INDEX_BRUTE_FORCE_MAX
+
+logger = logging.getLogger(__name__)
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+
+class _Namespace:
+    """
+    On-disk layout of one namespace:
+    - info.json    -> {"dim": 384}
+    - vectors.f32  -> row-major float32 matrix, memory-mapped for queries
+    - meta.jsonl   -> append-only {"id", "row", "metadata"} records; a later
+                      record for the same id overrides the earlier one, and
+                      {"id", "row", "deleted": true} retires the row
+    - hnsw.bin     -> optional HNSW graph for large namespaces
+    - hnsw.json    -> {"offset"}: bytes of meta.jsonl the saved graph covers
+
+    meta.jsonl is read incrementally - each refresh only parses the
+    records appended since the last one. Callers hold self.lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.info_path = os.path.join(path, "info.json")
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.meta_path = os.path.join(path, "meta.jsonl")
+        self.hnsw_path = os.path.join(path, "hnsw.bin")
+        self.hnsw_info_path = os.path.join(path, "hnsw.json")
+        self.lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.dim = None
+        self.ids = []
+        self.rows = {}
+        self.metadata = []
+        self.dead = np.empty(0, dtype=np.int64)  # rows of deleted vectors
+        self.vectors = None
+        self.hnsw = None
+        self._hnsw_offset = 0
+        self._offset = 0  # bytes of meta.jsonl applied so far
+        self._version = None
+
+    def __len__(self):
+        """Rows in vectors.f32, including deleted ones"""
+        return len(self.ids)
+
+    @property
+    def live(self) -> int:
+        return len(self.ids) - len(self.dead)
+
+    def _read_records(self, start: int, end: int = None) -> tuple[list[dict], int]:
+        """
+        Records in meta.jsonl from byte start (up to end), and the offset
+        after the last complete line - a line still being written is left
+        for the next read
+        """
+        with open(self.meta_path, "rb") as f:
+            f.seek(start)
+            data = f.read() if end is None else f.read(end - start)
+        complete = data.rfind(b"\n") + 1
+        return [json.loads(line) for line in data[:complete].splitlines()], start + complete
+
+    def refresh(self):
+        """Apply records another process (e.g. an ingest worker) has appended"""
+        if not os.path.exists(self.meta_path):
+            return
+        stat = os.stat(self.meta_path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        if version == self._version:
+            return
+        if stat.st_size < self._offset:
+            # Namespace was removed and written again - start over
+            self._reset()
+
+        if self.dim is None:
+            with open(self.info_path) as f:
+                self.dim = json.load(f)["dim"]
+
+        records, self._offset = self._read_records(self._offset)
+        previous_count = len(self.ids)
+        dead_changed = False
+        for record in records:
+            row = record["row"]
+            if row >= len(self.ids):
+                grow = row + 1 - len(self.ids)
+                self.ids += [None] * grow
+                self.metadata += [{}] * grow
+            if record.get("deleted"):
+                self.rows.pop(record["id"], None)
+                self.ids[row] = None
+                self.metadata[row] = {}
+                dead_changed = True
+                continue
+            self.rows[record["id"]] = row
+            self.ids[row] = record["id"]
+            self.metadata[row] = record["metadata"]
+
+        count = len(self.ids)
+        if dead_changed or count != previous_count:
+            self.dead = np.asarray([i for i in range(count) if self.ids[i] is None], dtype=np.int64)
+        if count and (self.vectors is None or len(self.vectors) != count):
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(count, self.dim))
+        self._version = version
+
+    def write(self, vectors: list[dict]):
+        """Overwrite rows for known ids, append rows for new ones"""
+        os.makedirs(self.path, exist_ok=True)
+        values = np.asarray([v["values"] for v in vectors], dtype=np.float32)
+        if self.dim is None:
+            self.dim = values.shape[1]
+            with open(self.info_path, "w") as f:
+                json.dump({"dim": self.dim}, f)
+
+        next_row = len(self.ids)
+        records = []
+        mode = "r+b" if os.path.exists(self.vectors_path) else "wb"
+        with open(self.vectors_path, mode) as f:
+            for vector, vals in zip(vectors, values):
+                row = self.rows.get(vector["id"])
+                if row is None:
+                    row = next_row
+                    next_row += 1
+                    self.rows[vector["id"]] = row
+                f.seek(row * self.dim * 4)
+                f.write(vals.tobytes())
+                records.append({"id": vector["id"], "row": row, "metadata": vector.get("metadata", {})})
+
+        # Metadata goes last, so readers never see a row whose vector is not written yet
+        with open(self.meta_path, "a") as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+
+    def delete(self, ids: list[str]):
+        """Retire rows; their space in vectors.f32 is not reused"""
+        records = [
+            {"id": vector_id, "row": self.rows.pop(vector_id), "deleted": True}
+            for vector_id in ids if vector_id in self.rows
+        ]
+        if records:
+            with open(self.meta_path, "a") as f:
+                f.writelines(json.dumps(record) + "\n" for record in records)
+
+    def hnsw_index(self):
+        """
+        The HNSW graph, with rows written since it was built or saved
+        added in place (add_items replaces the vector of a known label)
+        """
+        if self.hnsw is None:
+            self._load_hnsw()
+        if self._hnsw_offset < self._offset:
+            records, _ = self._read_records(self._hnsw_offset, self._offset)
+            rows = sorted({record["row"] for record in records if not record.get("deleted")})
+            if len(self) > self.hnsw.get_max_elements():
+                self.hnsw.resize_index(len(self))
+            if rows:
+                self.hnsw.add_items(np.asarray(self.vectors[rows]), np.asarray(rows))
+            self._hnsw_offset = self._offset
+            self._save_hnsw()
+        return self.hnsw
+
+    def _load_hnsw(self):
+        """The saved graph (and the offset it covers), or a new one over every row"""
+        count = len(self)
+        if os.path.exists(self.hnsw_path) and os.path.exists(self.hnsw_info_path):
+            with open(self.hnsw_info_path) as f:
+                offset = json.load(f)["offset"]
+            index = hnswlib.Index(space="ip", dim=self.dim)
+            index.load_index(self.hnsw_path, max_elements=count)
+            if offset <= self._offset and index.get_current_count() <= count:
+                index.set_ef(64)
+                self.hnsw, self._hnsw_offset = index, offset
+                return
+
+        index = hnswlib.Index(space="ip", dim=self.dim)
+        index.init_index(max_elements=count, ef_construction=200, M=16)
+        index.add_items(np.asarray(self.vectors), np.arange(count))
+        index.set_ef(64)
+        self.hnsw, self._hnsw_offset = index, self._offset
+        self._save_hnsw()
+
+    def _save_hnsw(self):
+        """Graph first, then the offset - a reader never trusts a graph for more rows than it has"""
+        suffix = f".{os.getpid()}.tmp"
+        self.hnsw.save_index(self.hnsw_path + suffix)
+        os.replace(self.hnsw_path + suffix, self.hnsw_path)
+        with open(self.hnsw_info_path + suffix, "w") as f:
+            json.dump({"offset": self._hnsw_offset}, f)
+        os.replace(self.hnsw_info_path + suffix, self.hnsw_info_path)
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector index, one directory per namespace
+
+    Small namespaces (the usual per-document case) are searched with a
+    NumPy brute-force dot product over the memory-mapped matrix; past
+    LOCAL_INDEX_BRUTE_FORCE_MAX rows an HNSW graph is used when hnswlib
+    is installed. Vectors are normalized, so dot product = cosine.
+    """
+
+    def __init__(self, root: str = VECTOR_STORE_DIR, brute_force_max: int = LOCAL_INDEX_BRUTE_FORCE_MAX):
+        self.root = root
+        self.brute_force_max = brute_force_max
+        self.namespaces = {}
+        self.lock = threading.Lock()
+
+    def _namespace(self, namespace: str) -> _Namespace:
+        with self.lock:
+            ns = self.namespaces.get(namespace)
+            if ns is None:
+                ns = _Namespace(os.path.join(self.root, namespace.replace(":", "__")))
+                self.namespaces[namespace] = ns
+        with ns.lock:
+            ns.refresh()
+        return ns
+
+    def upsert(self, vectors, namespace, document_id):
+        ns = self._namespace(namespace)
+        with ns.lock:
+            ns.write(vectors)
+            ns.refresh()
+        logger.debug("Upserted %d vectors to local index in namespace '%s'", len(vectors), namespace)
+
+    def query(self, vector, namespace, top_k=5, document_id=None):
+        ns = self._namespace(namespace)
+        if ns.live == 0:
+            return {"matches": []}
+
+        q = np.asarray(vector, dtype=np.float32)
+        k = min(top_k, ns.live)
+        if len(ns) > self.brute_force_max and hnswlib is not None:
+            # Over-fetch by the deleted rows still in the graph, then drop them
+            with ns.lock:
+                labels, distances = ns.hnsw_index().knn_query(q, k=min(k + len(ns.dead), len(ns)))
+            rows, scores = labels[0], 1.0 - distances[0]
+        else:
+            with ns.lock:
+                vectors, dead = ns.vectors, ns.dead
+            all_scores = vectors @ q
+            all_scores[dead] = -np.inf
+            rows = np.argpartition(-all_scores, k - 1)[:k]
+            rows = rows[np.argsort(-all_scores[rows])]
+            scores = all_scores[rows]
+
+        matches = [
+            {"id": ns.ids[row], "score": float(score), "metadata": ns.metadata[row]}
+            for row, score in zip(rows, scores)
+            if ns.ids[row] is not None
+        ]
+        return {"matches": matches[:k]}
+
+    def fetch(self, ids, namespace):
+        ns = self._namespace(namespace)
+        found = {}
+        for vector_id in ids:
+            row = ns.rows.get(vector_id)
+            if row is not None:
+                found[vector_id] = {"values": np.array(ns.vectors[row]), "metadata": ns.metadata[row]}
+        return found
+
+    def delete(self, ids, namespace):
+        ns = self._namespace(namespace)
+        with ns.lock:
+            ns.delete(ids)
+            ns.refresh()
+        logger.debug("Deleted %d vectors from local index in namespace '%s'", len(ids), namespace)
@@ -1,18 +1,54 @@
-from pinecone import Pinecone
+import logging
+import numpy as np
+from utils.lazy import Lazy
 from config.settings import PINECONE_API_KEY, PINECONE_INDEX
 
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX)
+logger = logging.getLogger(__name__)
+
+
+def _connect():
+    from pinecone import Pinecone
+
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    return pc.Index(PINECONE_INDEX)
+
+
+index = Lazy("pinecone", _connect)
+
+# Pinecone caps fetch/delete requests at 1000 ids
+_ID_BATCH = 1000
+
+def _to_list(values):
+    """Embeddings stay float32 arrays until they hit the wire"""
+    return values.tolist() if isinstance(values, np.ndarray) else values
 
 def upsert(vectors, namespace, document_id):
-    index.upsert(vectors=vectors, namespace=namespace)
-    print(f"Upserted {len(vectors)} vectors to Pinecone index '{PINECONE_INDEX}' in namespace '{namespace}'")
+    vectors = [{**v, "values": _to_list(v["values"])} for v in vectors]
+    index.get().upsert(vectors=vectors, namespace=namespace)
+    logger.debug("Upserted %d vectors to Pinecone index '%s' in namespace '%s'", len(vectors), PINECONE_INDEX, namespace)
 
 def query(vector, namespace, top_k=5, document_id=None):
-    print(f"Querying Pinecone index '{PINECONE_INDEX}' in namespace '{namespace}' with top_k={top_k}.")
-    return index.query(
-        vector=vector,
+    logger.debug("Querying Pinecone index '%s' in namespace '%s' with top_k=%d.", PINECONE_INDEX, namespace, top_k)
+    return index.get().query(
+        vector=_to_list(vector),
         top_k=top_k,
         include_metadata=True,
         namespace=namespace
     )
+
+def fetch(ids, namespace):
+    """Stored values and metadata by id: {id: {"values", "metadata"}}"""
+    found = {}
+    for start in range(0, len(ids), _ID_BATCH):
+        response = index.get().fetch(ids=ids[start:start + _ID_BATCH], namespace=namespace)
+        for vector_id, vector in response.vectors.items():
+            found[vector_id] = {
+                "values": np.asarray(vector.values, dtype=np.float32),
+                "metadata": dict(vector.metadata or {})
+            }
+    return found
+
+def delete(ids, namespace):
+    for start in range(0, len(ids), _ID_BATCH):
+        index.get().delete(ids=ids[start:start + _ID_BATCH], namespace=namespace)
+    logger.debug("Deleted %d vectors from Pinecone namespace '%s'", len(ids), namespace)
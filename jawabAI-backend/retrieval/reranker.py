@@ -0,0 +1,51 @@
+import logging
+import asyncio
+from utils.lazy import Lazy
+from config.settings import RERANKER_MODEL, RERANKER_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """
+    Re-scores fused retrieval candidates with a CPU cross-encoder
+
+    The model reads the question and each chunk together, which ranks
+    exact matches far better than comparing two independent embeddings.
+    Loaded on first use so the API starts without it.
+    """
+
+    def __init__(self, model_name: str = RERANKER_MODEL, batch_size: int = RERANKER_BATCH_SIZE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = Lazy("reranker", self._load)
+
+    def _load(self):
+        from sentence_transformers import CrossEncoder
+        logger.info("🔁 Loading reranker %s", self.model_name)
+        return CrossEncoder(self.model_name, device="cpu")
+
+    def rerank(self, query: str, pieces: list[dict]) -> list[dict]:
+        """
+        pieces: [{"text", "score", ...}] - returned best first with the
+        cross-encoder score as "score" (any fused_score no longer ranks them)
+        """
+        candidates = [p for p in pieces if p["text"]]
+        if not candidates:
+            return pieces
+        scores = self.model.get().predict(
+            [(query, p["text"]) for p in candidates], batch_size=self.batch_size
+        )
+        reranked = [
+            {**{key: value for key, value in p.items() if key != "fused_score"}, "score": float(score)}
+            for p, score in zip(candidates, scores)
+        ]
+        reranked.sort(key=lambda p: p["score"], reverse=True)
+        return reranked
+
+    async def arerank(self, query: str, pieces: list[dict]) -> list[dict]:
+        return await asyncio.to_thread(self.rerank, query, pieces)
+
+
+# Global instance (None when RERANKER_MODEL is unset)
+reranker = CrossEncoderReranker() if RERANKER_MODEL else None
@@ -0,0 +1,34 @@
+from retrieval.base import VectorStore
+from config.settings import VECTOR_STORE
+
+
+class PineconeVectorStore(VectorStore):
+    def __init__(self):
+        # Imported here so local mode never needs Pinecone credentials
+        from retrieval import pinecone_client
+        self.client = pinecone_client
+
+    def upsert(self, vectors, namespace, document_id):
+        self.client.upsert(vectors, namespace, document_id)
+
+    def query(self, vector, namespace, top_k=5, document_id=None):
+        return self.client.query(vector, namespace, top_k=top_k, document_id=document_id)
+
+    def fetch(self, ids, namespace):
+        return self.client.fetch(ids, namespace)
+
+    def delete(self, ids, namespace):
+        self.client.delete(ids, namespace)
+
+
+def get_vector_store(name: str = VECTOR_STORE) -> VectorStore:
+    if name == "local":
+        from retrieval.local_store import LocalVectorStore
+        return LocalVectorStore()
+    if name == "pinecone":
+        return PineconeVectorStore()
+    raise ValueError(f"Unknown vector store: {name}")
+
+
+# Global instance
+vector_store = get_vector_store()
@@ -0,0 +1,51 @@
+"""
+Chunk text stored once per document, referenced by vector id
+
+Key: chunks:{document_id} -> {vector_id: packed (optionally zstd) text}
+Keeps vector metadata small, so Pinecone payloads and local metadata
+logs carry only page/source fields.
+"""
+
+from storage.redis_client import redis_binary_client, async_redis_binary_client
+from utils.serialization import pack, unpack
+
+
+def chunk_store_key(document_id: str) -> str:
+    return f"chunks:{document_id}"
+
+
+def save_chunk_texts(document_id: str, texts: dict):
+    """texts: {vector_id: chunk text}"""
+    if texts:
+        redis_binary_client.hset(
+            chunk_store_key(document_id),
+            mapping={vector_id: pack(text) for vector_id, text in texts.items()}
+        )
+
+
+def load_chunk_texts(document_id: str, vector_ids: list[str]) -> dict:
+    """Blocking fetch_chunk_texts, for the ingest pipeline"""
+    if not vector_ids:
+        return {}
+    blobs = redis_binary_client.hmget(chunk_store_key(document_id), vector_ids)
+    return {
+        vector_id: unpack(blob)
+        for vector_id, blob in zip(vector_ids, blobs)
+        if blob is not None
+    }
+
+
+def delete_chunk_texts(document_id: str, vector_ids: list[str]):
+    if vector_ids:
+        redis_binary_client.hdel(chunk_store_key(document_id), *vector_ids)
+
+async def fetch_chunk_texts(document_id: str, vector_ids: list[str]) -> dict:
+    """Returns {vector_id: text} for the ids that are stored"""
+    if not vector_ids:
+        return {}
+    blobs = await async_redis_binary_client.hmget(chunk_store_key(document_id), vector_ids)
+    return {
+        vector_id: unpack(blob)
+        for vector_id, blob in zip(vector_ids, blobs)
+        if blob is not None
+    }
@@ -1,21 +1,35 @@
-import cloudinary
-import cloudinary.uploader
+import logging
+import asyncio
 import os
 from dotenv import load_dotenv
+from utils.lazy import Lazy
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-)
+def _configure():
+    import cloudinary
+    import cloudinary.uploader
+
+    cloudinary.config(
+        cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+        api_key=os.getenv("CLOUDINARY_API_KEY"),
+        api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+    )
+    return cloudinary.uploader
+
+uploader = Lazy("cloudinary", _configure)
 
 def upload_file(file, folder):
-    result = cloudinary.uploader.upload(
+    result = uploader.get().upload(
         file,
         resource_type="raw",
         folder=folder
     )
-    print(f"File uploaded to Cloudinary: {result.get('secure_url')}")
+    logger.info("File uploaded to Cloudinary: %s", result.get("secure_url"))
     return result["secure_url"]
+
+async def aupload_file(file, folder):
+    """Async wrapper - the Cloudinary SDK is blocking, so run it in a worker thread"""
+    return await asyncio.to_thread(upload_file, file, folder)
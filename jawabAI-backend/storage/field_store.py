@@ -0,0 +1,35 @@
+"""
+Structured invoice fields extracted at ingest time
+
+Key: invoice:fields:{document_id} -> packed {field: {"value", "page", "method"}}
+Fields only change when a new revision is ingested (which publishes an
+invalidation), so reads are served from an in-process cache after the
+first lookup.
+"""
+
+from storage.redis_client import redis_binary_client, async_redis_binary_client
+from utils.serialization import pack, unpack
+from utils.ttl_cache import TTLCache
+
+_local = TTLCache("invoice_fields")
+
+
+def field_store_key(document_id: str) -> str:
+    return f"invoice:fields:{document_id}"
+
+
+def save_invoice_fields(document_id: str, fields: dict):
+    key = field_store_key(document_id)
+    redis_binary_client.set(key, pack(fields))
+    _local.set(key, fields)
+
+
+async def fetch_invoice_fields(document_id: str):
+    """The document's fields, or None if it was not ingested as an invoice"""
+    key = field_store_key(document_id)
+    fields = _local.get(key)
+    if fields is None:
+        fields = unpack(await async_redis_binary_client.get(key))
+        if fields is not None:
+            _local.set(key, fields)
+    return fields
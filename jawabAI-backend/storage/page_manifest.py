@@ -0,0 +1,44 @@
+"""
+Per-document page manifest, used to re-ingest revisions incrementally
+
+Key: pages:{document_id} -> packed {
+    "file_hash":  SHA-256 of the ingested PDF (None if unknown),
+    "use_case":   namespace prefix the vectors live under,
+    "chunking":   [embedding model, chunk tokens, overlap tokens, cross_page],
+    "next_id":    first unused vector number ({document_id}_{n}),
+    "pages":      [{"hash", "vectors": [vector ids]}] in page order
+}
+It is only written by a successful ingest, so its presence also means
+the document has a complete revision to answer from while a newer one
+is being ingested. A page's vectors are the chunks that start on it. With per-page chunking
+(and the same chunking settings) they depend on nothing but the page
+text, so an unchanged page hash means its vectors can be reused as they
+are.
+"""
+
+import hashlib
+from storage.redis_client import redis_binary_client, async_redis_binary_client
+from utils.serialization import pack, unpack
+
+
+def page_manifest_key(document_id: str) -> str:
+    return f"pages:{document_id}"
+
+
+def page_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def save_page_manifest(document_id: str, manifest: dict):
+    redis_binary_client.set(page_manifest_key(document_id), pack(manifest))
+
+
+def load_page_manifest(document_id: str):
+    """The manifest of the last successful ingest, or None"""
+    return unpack(redis_binary_client.get(page_manifest_key(document_id)))
+
+
+async def ahas_page_manifests(document_ids: list[str]) -> bool:
+    """True when every document has completed at least one ingest"""
+    keys = [page_manifest_key(document_id) for document_id in document_ids]
+    return await async_redis_binary_client.exists(*keys) == len(keys)
@@ -1,8 +1,37 @@
-from redis import Redis
-from config.settings import REDIS_URL, REDIS_TOKEN
+from redis import Redis, ConnectionPool
+from redis.asyncio import Redis as AsyncRedis, BlockingConnectionPool as AsyncBlockingConnectionPool
+from config.settings import REDIS_URL, REDIS_TOKEN, REDIS_MAX_CONNECTIONS
 
-redis_client = Redis.from_url(
-    REDIS_URL,
+# Explicit pools so every module shares warm connections instead of
+# opening new ones (each TLS handshake to Upstash costs real milliseconds)
+_pool_options = dict(
     password=REDIS_TOKEN,
-    decode_responses=True
+    max_connections=REDIS_MAX_CONNECTIONS,
+    health_check_interval=30,
+    socket_keepalive=True
+)
+
+# Sync client - used by the ingestion pipeline (runs off the event loop)
+redis_client = Redis(
+    connection_pool=ConnectionPool.from_url(REDIS_URL, decode_responses=True, **_pool_options)
+)
+
+# Binary-safe client (no decoding) - used for packed float32 vectors
+redis_binary_client = Redis(
+    connection_pool=ConnectionPool.from_url(REDIS_URL, decode_responses=False, **_pool_options)
+)
+
+# Async clients - used by the API request path so Redis round trips
+# never block the event loop. Blocking pools make bursts wait for a free
+# connection instead of failing.
+async_redis_client = AsyncRedis(
+    connection_pool=AsyncBlockingConnectionPool.from_url(
+        REDIS_URL, decode_responses=True, timeout=5, **_pool_options
+    )
+)
+
+async_redis_binary_client = AsyncRedis(
+    connection_pool=AsyncBlockingConnectionPool.from_url(
+        REDIS_URL, decode_responses=False, timeout=5, **_pool_options
+    )
 )
@@ -0,0 +1,25 @@
+import os
+from config.settings import INGEST_SPOOL_DIR
+
+
+def spool_path(document_id: str) -> str:
+    return os.path.join(INGEST_SPOOL_DIR, f"{document_id}.pdf")
+
+
+def spool_upload(document_id: str, content: bytes) -> str:
+    """Write uploaded bytes to the local spool so ingestion can read them from disk"""
+    os.makedirs(INGEST_SPOOL_DIR, exist_ok=True)
+    path = spool_path(document_id)
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+def is_spooled(path: str) -> bool:
+    return os.path.dirname(os.path.abspath(path)) == os.path.abspath(INGEST_SPOOL_DIR)
+
+
+def remove_spooled(path: str):
+    """Delete a spooled upload once ingestion no longer needs it"""
+    if is_spooled(path) and os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,5 @@
+import os
+
+# storage.redis_client builds its connection pools at import time (they
+# only connect on first use) - unit tests never reach a real server
+os.environ.setdefault("UPSTASH_REDIS_REST_URL", "redis://localhost:6379/0")
@@ -0,0 +1,49 @@
+from retrieval.bm25 import BM25Builder, BM25Index, tokenize
+
+
+def build():
+    builder = BM25Builder(source="notes.pdf")
+    builder.add("doc_0", "Photosynthesis converts light energy into chemical energy.", 1, 1)
+    builder.add("doc_1", "The mitochondria is the powerhouse of the cell.", 2, 2)
+    builder.add("doc_2", "Section 4.2: light reactions of photosynthesis in the thylakoid.", 3, 4)
+    return builder.build()
+
+
+def test_tokenize_keeps_identifiers():
+    assert "4.2" in tokenize("See Section 4.2 for details")
+    assert "hello" in tokenize("Hello, world!")
+
+
+def test_search_ranks_matching_chunks():
+    index = build()
+    results = index.search("light reactions photosynthesis", top_k=5)
+    assert [i for i, _ in results] == [2, 0]
+    assert results[0][1] > results[1][1]
+
+
+def test_search_skips_chunks_without_query_terms():
+    index = build()
+    assert index.search("quantum chromodynamics") == []
+    assert [i for i, _ in index.search("photosynthesis", top_k=1)] in ([0], [2])
+
+
+def test_matches_shape():
+    match = build().matches("mitochondria", 3, "doc")[0]
+    assert match["id"] == "doc_1"
+    assert match["document_id"] == "doc"
+    assert match["metadata"] == {"page": 2, "page_end": 2, "source": "notes.pdf", "document_id": "doc"}
+
+
+def test_round_trip():
+    index = build()
+    restored = BM25Index.from_bytes(index.to_bytes())
+    assert len(restored) == len(index)
+    assert restored.source == "notes.pdf"
+    assert restored.search("light photosynthesis") == index.search("light photosynthesis")
+    assert restored.matches("thylakoid", 1, "doc")[0]["metadata"]["page_end"] == 4
+
+
+def test_empty_index():
+    index = BM25Index.from_bytes(BM25Builder().build().to_bytes())
+    assert len(index) == 0
+    assert index.search("anything") == []
@@ -0,0 +1,60 @@
+import pytest
+from processing import chunker
+from processing.chunker import PageChunker, chunk_text
+from config.settings import CHUNK_TOKENS
+
+
+class WordTokenizer:
+    """One token per word - keeps the tests off the Hugging Face download"""
+
+    def encode(self, text, add_special_tokens=False):
+        return text.split()
+
+
+@pytest.fixture(autouse=True)
+def word_tokenizer():
+    chunker.tokenizer.set(WordTokenizer())
+
+
+def page(number: int, words: int) -> dict:
+    return {"page_number": number, "text": " ".join(f"p{number}w{i}" for i in range(words))}
+
+
+def test_per_page_chunks_stay_on_their_page():
+    pages = [page(1, 300), page(2, 300)]
+    chunks = chunk_text(pages, cross_page=False)
+    assert {c["page"] for c in chunks} == {1, 2}
+    assert all(c["page"] == c["page_end"] for c in chunks)
+    assert all(len(c["text"].split()) <= CHUNK_TOKENS for c in chunks)
+    assert all(c["text"].startswith(f"p{c['page']}w") for c in chunks)
+
+
+def test_cross_page_chunks_record_page_span():
+    pages = [page(1, 300), page(2, 300), page(3, 50)]
+    chunks = chunk_text(pages, cross_page=True)
+    assert any(c["page_end"] > c["page"] for c in chunks)
+    assert all(len(c["text"].split()) <= CHUNK_TOKENS for c in chunks)
+    for c in chunks:
+        assert c["text"].startswith(f"p{c['page']}w")
+        assert c["text"].split()[-1].startswith(f"p{c['page_end']}w")
+    # Every word of every page ends up in some chunk
+    words = {word for c in chunks for word in c["text"].split()}
+    assert all(word in words for p in pages for word in p["text"].split())
+
+
+def test_cross_page_feed_holds_back_the_last_chunk():
+    paged = PageChunker("study", cross_page=True)
+    assert paged.feed(page(1, 100)) == []
+    assert paged.feed({"page_number": 2, "text": ""}) == []
+    emitted = paged.feed(page(3, 300))
+    assert emitted and emitted[0]["page"] == 1
+    rest = paged.flush()
+    assert rest and rest[-1]["page_end"] == 3
+    assert paged.flush() == []
+
+
+def test_invoice_sections_split_at_keyword_lines():
+    text = "ACME Supplies\nInvoice No: 42\nItem one\nTotal: 100.00\nThanks"
+    chunks = chunk_text([{"page_number": 1, "text": text}], use_case="invoice", cross_page=True)
+    assert [c["text"] for c in chunks] == ["ACME Supplies Invoice No: 42", "Item one Total: 100.00", "Thanks"]
+    assert all(c["page"] == c["page_end"] == 1 for c in chunks)
@@ -0,0 +1,80 @@
+from llm.context import assemble_context, estimate_tokens, _overlap
+
+SENTENCE = "Photosynthesis converts light energy into chemical energy stored in glucose molecules"
+
+
+def piece(text, score, page=1, page_end=None, document_id="doc", source=None):
+    return {
+        "text": text,
+        "score": score,
+        "page": page,
+        "page_end": page if page_end is None else page_end,
+        "document_id": document_id,
+        "sources": [source or f"{document_id}:{page}:{score}"]
+    }
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+
+def test_overlap_requires_minimum_length():
+    a = "intro " + SENTENCE
+    assert _overlap(a, SENTENCE + " and more") == len(SENTENCE)
+    assert _overlap("ends with energy", "energy starts here") == 0
+
+
+def test_overlapping_chunks_are_merged():
+    first = piece("Chapter one. " + SENTENCE, 0.9, page=1, source="a")
+    second = piece(SENTENCE + " The Calvin cycle follows.", 0.7, page=2, source="b")
+    context, stats, sources = assemble_context([first, second])
+    assert stats["merged"] == 1
+    assert context == "[Page 1-2] Chapter one. " + SENTENCE + " The Calvin cycle follows."
+    assert sources == ["a", "b"]
+
+
+def test_contained_chunk_is_merged():
+    context, stats, sources = assemble_context([
+        piece(SENTENCE, 0.5, source="inner"),
+        piece("Intro. " + SENTENCE + " Outro.", 0.8, source="outer")
+    ])
+    assert stats["merged"] == 1
+    assert context.count(SENTENCE) == 1
+    assert sorted(sources) == ["inner", "outer"]
+
+
+def test_near_duplicates_from_other_documents_are_dropped():
+    context, stats, sources = assemble_context([
+        piece(SENTENCE + " today", 0.9, document_id="a", source="keep"),
+        piece(SENTENCE + " tonight", 0.6, document_id="b", source="drop")
+    ], dedup_threshold=0.7)
+    assert stats["deduplicated"] == 1
+    assert sources == ["keep"]
+
+
+def test_budget_keeps_best_pieces_and_their_sources():
+    pieces = [
+        piece("alpha " * 40, 0.9, page=1, source="best"),
+        piece("beta " * 40, 0.8, page=5, source="second"),
+        piece("gamma " * 40, 0.7, page=9, source="over")
+    ]
+    context, stats, sources = assemble_context(pieces, budget=120)
+    assert stats["dropped"] == 1
+    assert stats["context_tokens"] <= 120
+    assert "gamma" not in context
+    assert sources == ["best", "second"]
+
+
+def test_oversized_best_piece_is_truncated_not_dropped():
+    context, stats, sources = assemble_context([piece("word " * 500, 0.9, source="long")], budget=50)
+    assert context
+    assert stats["context_tokens"] <= 50
+    assert sources == ["long"]
+
+
+def test_empty_pieces_are_ignored():
+    context, stats, sources = assemble_context([piece("", 0.9)])
+    assert context == ""
+    assert sources == []
@@ -0,0 +1,17 @@
+from retrieval.fanout import reciprocal_rank_fusion, ranking_score
+
+
+def test_fusion_keeps_the_dense_score():
+    dense = [{"id": "a", "score": 0.8}, {"id": "b", "score": 0.7}]
+    lexical = [{"id": "c", "score": 9.1}, {"id": "a", "score": 5.0}]
+    fused = reciprocal_rank_fusion([dense, lexical], k=60)
+    assert [m["id"] for m in fused] == ["a", "c", "b"]
+    assert fused[0]["score"] == 0.8
+    assert fused[0]["fused_score"] == 1 / 61 + 1 / 62
+    # Only BM25 found it - there is no cosine similarity to report
+    assert fused[1]["score"] is None
+    assert [ranking_score(m) for m in fused] == sorted((ranking_score(m) for m in fused), reverse=True)
+
+
+def test_ranking_score_without_fusion():
+    assert ranking_score({"id": "a", "score": 0.5}) == 0.5
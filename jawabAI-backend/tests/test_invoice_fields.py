@@ -0,0 +1,89 @@
+from processing.invoice_fields import FIELD_LABELS, InvoiceFieldExtractor, requested_fields
+
+
+def extract(*pages):
+    extractor = InvoiceFieldExtractor(use_llm=False)
+    extractor.feed([{"page_number": page, "text": text} for page, text in enumerate(pages, 1)])
+    return extractor, extractor.finish()
+
+
+def test_split_gst_components_are_summed():
+    _, fields = extract("Subtotal 1,000.00\nCGST @ 9% 90.00\nSGST @ 9% 90.00\nTotal 1,180.00")
+    assert fields["tax"]["value"] == "180.00"
+    assert fields["total"]["value"] == "1,180.00"
+
+
+def test_split_gst_keeps_shared_currency():
+    _, fields = extract("CGST @ 9% ₹ 450.00\nSGST @ 9% ₹ 450.00")
+    assert fields["tax"]["value"] == "₹ 900.00"
+
+
+def test_explicit_total_tax_label_wins():
+    _, fields = extract("CGST 90.00\nSGST 90.00\nTotal Tax: 180.00\nTotal 1,180.00")
+    assert fields["tax"]["value"] == "180.00"
+    assert fields["tax"]["method"] == "rule"
+
+
+def test_single_component_used_as_is():
+    _, fields = extract("IGST @ 18% 180.00\nTotal 1,180.00")
+    assert fields["tax"]["value"] == "180.00"
+
+
+def test_repeated_components_are_ambiguous():
+    extractor, fields = extract("Item A CGST 9.00 SGST 9.00\nItem B CGST 4.50 SGST 4.50")
+    assert "tax" not in fields
+    assert "tax" in extractor.ambiguous
+
+
+def test_rate_is_not_an_amount():
+    _, fields = extract("VAT 20% 200.00\nTotal 1,200.00")
+    assert fields["tax"]["value"] == "200.00"
+
+
+def test_free_text_values_stop_at_the_end_of_their_line():
+    _, fields = extract(
+        "Vendor: Supplier 7 Pvt Ltd\n"
+        "Invoice No: INV-0007/001\n"
+        "Invoice Date: 12/03/2024\n"
+        "Total Tax: 120.00\n"
+        "Grand Total: 1,320.00\n"
+        "Payment Terms: Net 30 days\n"
+        "A and a that by glucose be enzyme that by the cell.\n"
+        "Enzyme mitochondria water plant protein oxygen the of and to."
+    )
+    assert fields["vendor"]["value"] == "Supplier 7 Pvt Ltd"
+    assert fields["payment_terms"]["value"] == "Net 30 days"
+    assert fields["invoice_number"]["value"] == "INV-0007/001"
+    assert fields["total"]["value"] == "1,320.00"
+
+
+def test_value_on_the_line_after_its_label():
+    _, fields = extract("Payment Terms:\nDue on receipt\nThank you for your business")
+    assert fields["payment_terms"]["value"] == "Due on receipt"
+
+
+def test_requested_fields():
+    assert requested_fields("How much tax did I pay?") == ["tax"]
+    assert requested_fields("What is the invoice number?") == ["invoice_number"]
+
+
+def test_rate_and_words_questions_are_not_field_lookups():
+    assert requested_fields("What is the tax rate?") == []
+    assert requested_fields("What percentage is the GST?") == []
+    assert requested_fields("What is the total amount in words?") == []
+
+
+def test_total_only_when_it_is_the_field():
+    assert requested_fields("What is the total amount?") == ["total"]
+    assert requested_fields("What's the total tax?") == ["tax"]
+    assert requested_fields("What is the total number of items?") == []
+
+
+def test_questions_about_other_things_go_to_retrieval():
+    assert requested_fields("Explain the terms of the contract") == []
+    assert requested_fields("What are the payment terms?") == ["payment_terms"]
+    assert requested_fields("Summarize this invoice") == []
+    assert requested_fields("Extract the line items") == []
+    assert requested_fields("How much did the cement cost?") == []
+    assert requested_fields("How much do I owe?") == ["total"]
+    assert requested_fields("Show me all the fields") == list(FIELD_LABELS)
@@ -0,0 +1,109 @@
+import json
+import numpy as np
+import pytest
+from retrieval import local_store
+from retrieval.local_store import LocalVectorStore
+
+DIM = 8
+
+
+def vectors(count: int, start: int = 0, seed: int = 0) -> list[dict]:
+    values = np.random.default_rng(seed).normal(size=(count, DIM)).astype(np.float32)
+    values /= np.linalg.norm(values, axis=1, keepdims=True)
+    return [
+        {"id": f"doc_{start + i}", "values": values[i].tolist(), "metadata": {"page": start + i}}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalVectorStore(root=str(tmp_path), brute_force_max=1000)
+
+
+def test_query_finds_nearest(store):
+    data = vectors(20)
+    store.upsert(data, "study:doc", "doc")
+    matches = store.query(data[7]["values"], "study:doc", top_k=3)["matches"]
+    assert matches[0]["id"] == "doc_7"
+    assert matches[0]["metadata"] == {"page": 7}
+    assert matches[0]["score"] == pytest.approx(1.0, abs=1e-5)
+    assert len(matches) == 3
+
+
+def test_unknown_namespace_is_empty(store):
+    assert store.query([0.0] * DIM, "study:missing")["matches"] == []
+
+
+def test_upsert_overwrites_known_ids(store):
+    data = vectors(5)
+    store.upsert(data, "ns", "doc")
+    store.upsert([{**data[0], "values": data[4]["values"], "metadata": {"page": 99}}], "ns", "doc")
+    ns = store.namespaces["ns"]
+    assert len(ns) == 5
+    assert store.fetch(["doc_0"], "ns")["doc_0"]["metadata"] == {"page": 99}
+    assert {m["id"] for m in store.query(data[4]["values"], "ns", top_k=2)["matches"]} == {"doc_0", "doc_4"}
+
+
+def test_deleted_rows_are_never_returned(store):
+    data = vectors(5)
+    store.upsert(data, "ns", "doc")
+    store.delete(["doc_2"], "ns")
+    matches = store.query(data[2]["values"], "ns", top_k=5)["matches"]
+    assert "doc_2" not in {m["id"] for m in matches}
+    assert len(matches) == 4
+    assert store.fetch(["doc_2", "doc_3"], "ns").keys() == {"doc_3"}
+
+
+def test_other_process_writes_are_picked_up(tmp_path):
+    reader = LocalVectorStore(root=str(tmp_path))
+    writer = LocalVectorStore(root=str(tmp_path))
+    writer.upsert(vectors(3), "ns", "doc")
+    assert len(reader.query(vectors(1)[0]["values"], "ns", top_k=5)["matches"]) == 3
+    writer.upsert(vectors(2, start=3, seed=1), "ns", "doc")
+    assert len(reader.query(vectors(1)[0]["values"], "ns", top_k=5)["matches"]) == 5
+
+
+def test_refresh_stops_at_a_partial_line(store):
+    store.upsert(vectors(3), "ns", "doc")
+    ns = store.namespaces["ns"]
+    offset = ns._offset
+    record = json.dumps({"id": "doc_3", "row": 3, "metadata": {}})
+    with open(ns.meta_path, "a") as f:
+        f.write(record[:10])
+    ns.refresh()
+    assert len(ns) == 3
+    assert ns._offset == offset
+    with open(ns.meta_path, "a") as f:
+        f.write(record[10:] + "\n")
+    with open(ns.vectors_path, "ab") as f:
+        f.write(np.zeros(DIM, dtype=np.float32).tobytes())
+    ns.refresh()
+    assert len(ns) == 4
+    assert ns.ids[3] == "doc_3"
+
+
+def test_hnsw_is_updated_in_place(tmp_path):
+    pytest.importorskip("hnswlib")
+    store = LocalVectorStore(root=str(tmp_path), brute_force_max=10)
+    first, second = vectors(40), vectors(20, start=40, seed=1)
+    store.upsert(first, "ns", "doc")
+    assert store.query(first[5]["values"], "ns", top_k=1)["matches"][0]["id"] == "doc_5"
+    graph = store.namespaces["ns"].hnsw
+
+    store.upsert(second, "ns", "doc")
+    assert store.query(second[3]["values"], "ns", top_k=1)["matches"][0]["id"] == "doc_43"
+    assert store.namespaces["ns"].hnsw is graph
+    assert graph.get_current_count() == 60
+
+    # A new process starts from the saved graph
+    reopened = LocalVectorStore(root=str(tmp_path), brute_force_max=10)
+    assert reopened.query(second[3]["values"], "ns", top_k=1)["matches"][0]["id"] == "doc_43"
+
+
+def test_brute_force_without_hnswlib(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_store, "hnswlib", None)
+    store = LocalVectorStore(root=str(tmp_path), brute_force_max=10)
+    data = vectors(30)
+    store.upsert(data, "ns", "doc")
+    assert store.query(data[12]["values"], "ns", top_k=1)["matches"][0]["id"] == "doc_12"
@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from utils.single_flight import SingleFlight
+
+
+def make_flight(**kwargs) -> SingleFlight:
+    flight = SingleFlight("test", lease_ms=2000, enabled=True, poll_ms=5, max_poll_ms=20, **kwargs)
+    flight.redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    return flight
+
+
+def test_concurrent_callers_share_one_run():
+    async def main():
+        flight = make_flight()
+        runs = []
+
+        async def work():
+            runs.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def lookup():
+            return None
+
+        results = await asyncio.gather(*(flight.do("key", work, lookup) for _ in range(5)))
+        return runs, results, await flight.redis.exists(flight.lease_key("key"))
+
+    runs, results, lease_left = asyncio.run(main())
+    assert len(runs) == 1
+    assert [result for result, _ in results] == ["result"] * 5
+    assert sorted(shared for _, shared in results) == [False] + [True] * 4
+    assert not lease_left
+
+
+def test_follower_of_another_process_polls_lookup():
+    async def main():
+        flight = make_flight()
+        store = {}
+        # Another process holds the lease and publishes its result later
+        await flight.redis.set(flight.lease_key("key"), "other-token", px=2000)
+
+        async def publish():
+            await asyncio.sleep(0.03)
+            store["key"] = "theirs"
+
+        async def work():
+            raise AssertionError("must not run while the lease is held")
+
+        async def lookup():
+            return store.get("key")
+
+        _, outcome = await asyncio.gather(publish(), flight.do("key", work, lookup))
+        return outcome
+
+    assert asyncio.run(main()) == ("theirs", True)
+
+
+def test_takes_over_when_the_lease_ends_without_a_result():
+    async def main():
+        flight = make_flight()
+        await flight.redis.set(flight.lease_key("key"), "crashed", px=30)
+
+        async def work():
+            return "mine"
+
+        async def lookup():
+            return None
+
+        return await flight.do("key", work, lookup)
+
+    assert asyncio.run(main()) == ("mine", False)
+
+
+def test_errors_reach_every_caller():
+    async def main():
+        flight = make_flight()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            raise ValueError("boom")
+
+        async def lookup():
+            return None
+
+        return await asyncio.gather(*(flight.do("key", work, lookup) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_disabled_runs_every_time():
+    async def main():
+        flight = make_flight()
+        flight.enabled = False
+        calls = []
+
+        async def work():
+            calls.append(1)
+            return len(calls)
+
+        async def lookup():
+            return None
+
+        results = await asyncio.gather(*(flight.do("key", work, lookup) for _ in range(3)))
+        return results, calls
+
+    results, calls = asyncio.run(main())
+    assert len(calls) == 3
+    assert all(not shared for _, shared in results)
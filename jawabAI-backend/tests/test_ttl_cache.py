@@ -0,0 +1,85 @@
+from utils import ttl_cache
+from utils.ttl_cache import TTLCache, adaptive_ttl, invalidate_local
+
+
+def test_get_set_and_miss():
+    cache = TTLCache("test_basic", maxsize=10, ttl=60)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("b", "default") == "default"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: now[0])
+    cache = TTLCache("test_expiry", ttl=10)
+    cache.set("a", 1)
+    now[0] += 9
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = TTLCache("test_lru", maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget():
+    cache = TTLCache("test_bytes", maxsize=100, ttl=60, max_bytes=10)
+    cache.set("a", b"12345")
+    cache.set("b", b"123456")
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 6
+    # A value larger than the whole budget is not cached at all
+    cache.set("c", b"x" * 11)
+    assert cache.get("c") is None
+    assert cache.get("b") == b"123456"
+
+
+def test_adaptive_ttl():
+    assert adaptive_ttl(10, 0, 100) == 10
+    assert adaptive_ttl(10, 1, 100) == 20
+    assert adaptive_ttl(10, 4, 100) == 40
+    assert adaptive_ttl(10, 1 << 20, 100) == 100
+
+
+def test_hits_extend_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: now[0])
+    cache = TTLCache("test_adaptive", ttl=10, max_ttl=100)
+    cache.set("a", 1)
+    for _ in range(4):
+        cache.get("a")
+    now[0] += 30
+    assert cache.get("a") == 1
+
+
+def test_on_hit_at_powers_of_two():
+    seen = []
+    cache = TTLCache("test_on_hit", ttl=60, on_hit=lambda key, hits: seen.append(hits))
+    cache.set("a", 1)
+    for _ in range(8):
+        cache.get("a")
+    assert seen == [1, 2, 4, 8]
+
+
+def test_invalidate_local_reaches_every_cache():
+    first = TTLCache("test_invalidate_1", ttl=60)
+    second = TTLCache("test_invalidate_2", ttl=60)
+    first.set("query:doc:1", 1)
+    first.set("query:other:1", 2)
+    second.set("bm25:doc", 3)
+    invalidate_local(keys=["bm25:doc"], prefixes=["query:doc:"])
+    assert first.get("query:doc:1") is None
+    assert first.get("query:other:1") == 2
+    assert second.get("bm25:doc") is None
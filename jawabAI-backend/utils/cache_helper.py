@@ -1,7 +1,23 @@
+import logging
+import asyncio
 import hashlib
-import json
+import re
+import numpy as np
 from typing import Optional
-from storage.redis_client import redis_client
+from storage.redis_client import async_redis_client, async_redis_binary_client
+from utils.ttl_cache import TTLCache, adaptive_ttl
+from utils.cache_invalidation import stage_invalidation
+from utils.serialization import pack, unpack, pack_vector, unpack_vector
+from utils.metrics import timed, record_cache
+from config.settings import (
+    SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES, LOCAL_CACHE_MAX_TTL,
+    QUERY_CACHE_TTL, QUERY_CACHE_MAX_TTL, PDF_CACHE_TTL, PDF_CACHE_MAX_TTL
+)
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
 
 class CacheHelper:
     """
@@ -9,11 +25,65 @@ class CacheHelper:
     
     Cache Strategy:
     1. PDF Cache: Hash PDF content to check if already processed
-    2. Query Cache: Hash (PDF + Query) to cache responses
+    2. Query Cache: Hash (PDF + normalized Query) to cache responses
+    3. Semantic Cache: per-document index of answered question embeddings,
+       so paraphrases above the similarity threshold reuse the answer
+       (the decoded matrix is kept in-process until the index changes)
+    
+    Two tiers: hot keys are kept in an in-process cache in front of Redis,
+    and related reads/writes are batched (MGET / pipelines) to save round
+    trips. TTLs adapt to popularity in both tiers - answers and PDF
+    mappings that keep getting hits live longer locally and in Redis.
+    Hits and misses are counted per tier ("local", "redis").
     """
     
     def __init__(self):
-        self.redis = redis_client
+        self.redis = async_redis_client
+        self.redis_binary = async_redis_binary_client
+        self.local = TTLCache("cache_helper", max_ttl=LOCAL_CACHE_MAX_TTL, on_hit=self._on_local_hit)
+        # qindex:{scope} -> (query hashes, decoded embedding matrix)
+        self.semantic = TTLCache("semantic_index")
+        self.tiers = {"local": [0, 0], "redis": [0, 0]}  # tier -> [hits, misses]
+        self._tasks = set()
+    
+    def _count(self, tier: str, hit: bool, count: int = 1):
+        self.tiers[tier][0 if hit else 1] += count
+        record_cache(tier, hit, count)
+    
+    def tier_stats(self) -> dict:
+        """Hit rate per tier - a Redis lookup only happens after a local miss"""
+        return {
+            tier: {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None
+            }
+            for tier, (hits, misses) in self.tiers.items()
+        }
+    
+    def _on_local_hit(self, key: str, hits: int):
+        """Extend the Redis TTL of answers and PDF mappings as they get popular"""
+        if key.startswith("query:"):
+            ttl = adaptive_ttl(QUERY_CACHE_TTL, hits, QUERY_CACHE_MAX_TTL)
+        elif key.startswith("pdf:hash:"):
+            ttl = adaptive_ttl(PDF_CACHE_TTL, hits, PDF_CACHE_MAX_TTL)
+        else:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(self._extend_ttl(key, int(ttl)))
+        except RuntimeError:
+            return
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _extend_ttl(self, key: str, ttl: int):
+        """Only ever lengthens - another process may already have extended it further"""
+        try:
+            if await self.redis.ttl(key) < ttl:
+                await self.redis.expire(key, ttl)
+                logger.debug("⏫ Extended TTL of %s to %ds", key, ttl)
+        except Exception as e:
+            logger.debug("TTL extension failed for %s: %s", key, e)
     
     def get_file_hash(self, file_content: bytes) -> str:
         """
@@ -22,57 +92,236 @@ class CacheHelper:
         """
         return hashlib.sha256(file_content).hexdigest()
     
+    def normalize_query(self, query: str) -> str:
+        """
+        Normalize a question so trivial variants share a cache entry
+        "What is photosynthesis?" == "what is  photosynthesis"
+        """
+        query = _PUNCTUATION.sub(" ", query.casefold())
+        return _WHITESPACE.sub(" ", query).strip()
+    
+    def get_query_hash(self, query: str) -> str:
+        return hashlib.sha256(self.normalize_query(query).encode()).hexdigest()[:16]
+    
     def get_query_cache_key(self, document_id: str, query: str) -> str:
         """
         Generate cache key for query responses
         Format: query:{document_id}:{query_hash}
         """
-        query_hash = hashlib.sha256(query.encode()).hexdigest()[:16]
-        return f"query:{document_id}:{query_hash}"
+        return f"query:{document_id}:{self.get_query_hash(query)}"
+    
+    def get_semantic_index_key(self, document_id: str) -> str:
+        """
+        Per-document hash of answered questions
+        Format: qindex:{document_id} -> {query_hash: packed float32/float16 embedding}
+        """
+        return f"qindex:{document_id}"
+    
+    def get_document_scopes_key(self, document_id: str) -> str:
+        """
+        Multi-document scopes that include a document, so a revision can
+        drop their answers too
+        Format: scopes:{document_id} -> {multi:{hash}}
+        """
+        return f"scopes:{document_id}"
     
-    def cache_pdf_mapping(self, file_hash: str, document_id: str, use_case: str, ttl: int = 86400):
+    async def cache_pdf_mapping(self, file_hash: str, document_id: str, use_case: str, ttl: int = PDF_CACHE_TTL):
         """
         Cache the mapping between file hash and document_id per use_case
-        TTL: 24 hours (86400 seconds)
+        TTL: PDF_CACHE_TTL (24 hours), extended while the file keeps being uploaded
         
         This prevents re-processing the same PDF for the same use_case
         """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            self.stage_pdf_mapping(pipe, file_hash, document_id, use_case, ttl)
+            await pipe.execute()
+    
+    def stage_pdf_mapping(self, pipe, file_hash: str, document_id: str, use_case: str, ttl: int = PDF_CACHE_TTL):
+        """
+        Queue the PDF mapping write on an existing pipeline, so the upload
+        path can send it together with its other writes in one round trip
+        """
         key = f"pdf:hash:{use_case}:{file_hash}"
-        self.redis.setex(key, ttl, document_id)
-        print(f"✅ Cached PDF mapping for {use_case}: {file_hash[:16]}... -> {document_id}")
+        pipe.setex(key, ttl, document_id)
+        self.local.set(key, document_id)
+        logger.debug("✅ Cached PDF mapping for %s: %.16s... -> %s", use_case, file_hash, document_id)
     
-    def get_cached_document_id(self, file_hash: str, use_case: str) -> Optional[str]:
+    async def get_cached_document_id(self, file_hash: str, use_case: str) -> Optional[str]:
         """
         Check if this PDF was already processed for this use_case
         Returns document_id if found, None otherwise
         """
         key = f"pdf:hash:{use_case}:{file_hash}"
-        cached_id = self.redis.get(key)
+        cached_id = self.local.get(key)
+        self._count("local", cached_id is not None)
+        if cached_id is None:
+            with timed("redis"):
+                cached_id = await self.redis.get(key)
+            self._count("redis", bool(cached_id))
+            if cached_id:
+                self.local.set(key, cached_id)
+        record_cache("pdf", bool(cached_id))
         if cached_id:
-            print(f"🎯 Cache HIT for {use_case}: PDF already processed as {cached_id}")
+            logger.debug("🎯 Cache HIT for %s: PDF already processed as %s", use_case, cached_id)
         return cached_id
     
-    def cache_query_response(self, document_id: str, query: str, response: dict, ttl: int = 3600):
+    async def cache_query_response(self, document_id: str, query: str, response: dict, ttl: int = QUERY_CACHE_TTL,
+                                   query_vec: Optional[np.ndarray] = None, document_ids: Optional[list[str]] = None):
         """
-        Cache query response for 1 hour (3600 seconds)
+        Cache query response for QUERY_CACHE_TTL (1 hour), extended while it keeps being asked
         
-        This speeds up repeated queries on same document
+        This speeds up repeated queries on same document. When the question
+        embedding is given it is also added to the semantic index. For a
+        multi-document scope, document_ids are the documents it covers.
         """
         key = self.get_query_cache_key(document_id, query)
-        self.redis.setex(key, ttl, json.dumps(response))
-        print(f"✅ Cached query response: {key}")
+        self.local.set(key, response)
+        
+        # Answer + semantic index entry in one round trip
+        with timed("redis"):
+            async with self.redis_binary.pipeline(transaction=False) as pipe:
+                pipe.setex(key, ttl, pack(response))
+                if document_id.startswith("multi:"):
+                    # Outlives the answers, which popularity can extend up to QUERY_CACHE_MAX_TTL
+                    for member in document_ids or ():
+                        scopes_key = self.get_document_scopes_key(member)
+                        pipe.sadd(scopes_key, document_id)
+                        pipe.expire(scopes_key, QUERY_CACHE_MAX_TTL)
+                if query_vec is not None:
+                    index_key = self.get_semantic_index_key(document_id)
+                    query_hash = self.get_query_hash(query)
+                    pipe.hset(index_key, query_hash, pack_vector(query_vec))
+                    pipe.expire(index_key, ttl)
+                    pipe.hlen(index_key)
+                    # Every process drops its decoded copy of the index
+                    stage_invalidation(pipe, keys=[index_key])
+                results = await pipe.execute()
+        logger.debug("✅ Cached query response: %s", key)
+        
+        if query_vec is not None and results[-2] > SEMANTIC_CACHE_MAX_ENTRIES:
+            # Index is full - keep the answer but take this question back out
+            await self.redis_binary.hdel(index_key, query_hash)
     
-    def get_cached_query_response(self, document_id: str, query: str) -> Optional[dict]:
+    async def get_cached_query_response(self, document_id: str, query: str) -> Optional[dict]:
         """
         Retrieve cached query response
         Returns cached response if found, None otherwise
         """
         key = self.get_query_cache_key(document_id, query)
-        cached = self.redis.get(key)
+        return await self._get_response(key)
+    
+    async def _get_response(self, key: str) -> Optional[dict]:
+        cached = self.local.get(key)
+        self._count("local", cached is not None)
+        if cached is not None:
+            logger.debug("🎯 Cache HIT: Query response found (in-process)")
+            return dict(cached)
+        with timed("redis"):
+            cached = await self.redis_binary.get(key)
+        self._count("redis", bool(cached))
         if cached:
-            print(f"🎯 Cache HIT: Query response found")
-            return json.loads(cached)
+            logger.debug("🎯 Cache HIT: Query response found")
+            response = unpack(cached)
+            self.local.set(key, response)
+            return dict(response)
         return None
+    
+    def get_cache_scope(self, document_ids: list[str]) -> str:
+        """
+        Query cache scope: the document_id itself, or for a multi-document
+        chat a stable hash of the sorted ids (multi:{hash})
+        """
+        if len(document_ids) == 1:
+            return document_ids[0]
+        joined = ",".join(sorted(set(document_ids)))
+        return f"multi:{hashlib.sha256(joined.encode()).hexdigest()[:16]}"
+    
+    async def get_chat_state(self, scope: str, query: str,
+                             document_ids: list[str]) -> tuple[list[Optional[str]], Optional[dict]]:
+        """
+        Fetch every document's ingest status and the cached answer together
+        Returns (statuses, cached_response) with a single MGET at most
+        """
+        status_keys = [f"ingest:{document_id}" for document_id in document_ids]
+        query_key = self.get_query_cache_key(scope, query)
+        statuses = [self.local.get(key) for key in status_keys]
+        response = self.local.get(query_key)
+        
+        local_hit = None not in statuses and response is not None
+        self._count("local", local_hit)
+        if local_hit:
+            logger.debug("🎯 Cache HIT: Query response found (in-process)")
+            record_cache("query", True)
+            return statuses, dict(response)
+        
+        with timed("redis"):
+            *redis_statuses, cached = await self.redis_binary.mget(*status_keys, query_key)
+        for i, (key, raw) in enumerate(zip(status_keys, redis_statuses)):
+            if statuses[i] is None:
+                statuses[i] = raw.decode() if raw else None
+                # Only DONE is stable enough to cache - PROCESSING changes any moment
+                if statuses[i] == "DONE":
+                    self.local.set(key, statuses[i])
+        if response is None:
+            self._count("redis", bool(cached))
+        if response is None and cached:
+            logger.debug("🎯 Cache HIT: Query response found")
+            response = unpack(cached)
+            self.local.set(query_key, response)
+        record_cache("query", response is not None)
+        return statuses, dict(response) if response is not None else None
+    
+    async def find_similar_query_response(self, document_id: str, query_vec: np.ndarray,
+                                          threshold: float = SEMANTIC_CACHE_THRESHOLD) -> Optional[dict]:
+        """
+        Compare the question embedding with every answered question for this
+        document (embeddings are normalized, so dot product = cosine) and
+        return the best cached response above the threshold
+        """
+        index_key = self.get_semantic_index_key(document_id)
+        query_vec = np.asarray(query_vec, dtype=np.float32)
+        index = await self._load_semantic_index(index_key, len(query_vec))
+        if index is None:
+            record_cache("semantic", False)
+            return None
+        
+        hashes, matrix = index
+        scores = matrix @ query_vec
+        best = int(np.argmax(scores))
+        if scores[best] < threshold:
+            record_cache("semantic", False)
+            return None
+        
+        query_hash = hashes[best].decode()
+        cached = await self._get_response(f"query:{document_id}:{query_hash}")
+        if not cached:
+            # Answer expired - drop the stale index entry
+            await self.redis_binary.hdel(index_key, hashes[best])
+            self.semantic.delete(index_key)
+            record_cache("semantic", False)
+            return None
+        
+        record_cache("semantic", True)
+        logger.debug("🎯 Semantic cache HIT (similarity %.3f)", scores[best])
+        return cached
+    
+    async def _load_semantic_index(self, index_key: str, dim: int) -> Optional[tuple]:
+        """
+        (query hashes, embedding matrix) of a semantic index, or None if it
+        is empty. Decoded once and kept in-process - cache_query_response
+        and revision invalidation drop it whenever the index changes.
+        """
+        index = self.semantic.get(index_key)
+        if index is not None and index[1].shape[1] == dim:
+            return index
+        with timed("redis"):
+            entries = await self.redis_binary.hgetall(index_key)
+        if not entries:
+            return None
+        hashes = list(entries.keys())
+        matrix = np.stack([unpack_vector(blob, dim) for blob in entries.values()])
+        self.semantic.set(index_key, (hashes, matrix))
+        return hashes, matrix
 
 # Global instance
 cache_helper = CacheHelper()
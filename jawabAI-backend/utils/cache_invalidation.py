@@ -0,0 +1,62 @@
+"""
+Invalidation of the in-process cache tier across processes
+
+Writers publish {"keys": [...], "prefixes": [...]} on
+CACHE_INVALIDATION_CHANNEL (Redis pub/sub). Every API process runs
+listen_for_invalidations() and drops matching entries from all of its
+TTLCaches, so local copies do not outlive a change in Redis (e.g. a
+document revision) by up to their TTL.
+"""
+
+import logging
+import asyncio
+import json
+from storage.redis_client import redis_client, async_redis_client
+from utils.ttl_cache import invalidate_local, clear_local
+from config.settings import CACHE_INVALIDATION_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+
+def _message(keys, prefixes) -> str:
+    return json.dumps({"keys": list(keys), "prefixes": list(prefixes)})
+
+
+def publish_invalidation(keys=(), prefixes=()):
+    """Blocking publish (ingestion); this process's caches are cleared right away"""
+    invalidate_local(keys, prefixes)
+    redis_client.publish(CACHE_INVALIDATION_CHANNEL, _message(keys, prefixes))
+
+
+async def apublish_invalidation(keys=(), prefixes=()):
+    invalidate_local(keys, prefixes)
+    await async_redis_client.publish(CACHE_INVALIDATION_CHANNEL, _message(keys, prefixes))
+
+
+def stage_invalidation(pipe, keys=(), prefixes=()):
+    """Queue the publish on an existing pipeline, to go out with the write it belongs to"""
+    invalidate_local(keys, prefixes)
+    pipe.publish(CACHE_INVALIDATION_CHANNEL, _message(keys, prefixes))
+
+
+async def listen_for_invalidations():
+    """Apply invalidation messages until cancelled, reconnecting on errors"""
+    while True:
+        pubsub = async_redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+            logger.info("📡 Listening for cache invalidations on %s", CACHE_INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                data = json.loads(message["data"])
+                invalidate_local(data.get("keys", ()), data.get("prefixes", ()))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("⚠️ Cache invalidation listener disconnected: %s", e)
+            # Messages may have been missed while disconnected
+            clear_local()
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
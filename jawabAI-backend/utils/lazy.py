@@ -0,0 +1,64 @@
+import threading
+import time
+
+# Every Lazy by name, for readiness reporting in /health
+_components = {}
+
+
+class Lazy:
+    """
+    Thread-safe lazy initializer for heavy models and clients
+
+    The factory runs once, on the first get() from any thread (others
+    wait for it); a failed load is retried on the next get(). Importing a
+    module that holds a Lazy costs nothing, so each process only pays for
+    the clients it actually uses.
+    """
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self.factory = factory
+        self.state = "not_loaded"
+        self.error = None
+        self.load_seconds = None
+        self._value = None
+        self._lock = threading.Lock()
+        _components[name] = self
+
+    @property
+    def loaded(self) -> bool:
+        return self.state == "ready"
+
+    def get(self):
+        if self.state == "ready":
+            return self._value
+        with self._lock:
+            if self.state != "ready":
+                self.state = "loading"
+                start = time.perf_counter()
+                try:
+                    self._value = self.factory()
+                except Exception as e:
+                    self.state, self.error = "failed", str(e)
+                    raise
+                self.load_seconds = round(time.perf_counter() - start, 3)
+                self.state, self.error = "ready", None
+            return self._value
+
+    def set(self, value):
+        """Use an existing object instead of the factory (benchmarks, tests)"""
+        with self._lock:
+            self._value = value
+            self.state, self.error = "ready", None
+
+    def status(self) -> dict:
+        status = {"state": self.state}
+        if self.load_seconds is not None:
+            status["load_seconds"] = self.load_seconds
+        if self.error:
+            status["error"] = self.error
+        return status
+
+
+def component_status() -> dict:
+    return {name: component.status() for name, component in _components.items()}
@@ -0,0 +1,209 @@
+"""
+Instrumentation: per-stage timers, cache hit/miss counters, queue depth,
+in-process cache size
+
+Exposed in Prometheus text format on /metrics. prometheus_client is
+used when installed; otherwise a small built-in registry renders the
+same metric names (counts and sums, no histogram buckets). With
+opentelemetry installed, every timed stage is also a span.
+
+    with timed("embed"):
+        ...
+    record_cache("query", hit=True)
+"""
+
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+try:
+    from opentelemetry import trace
+    _tracer = trace.get_tracer("jawabai")
+except ImportError:
+    _tracer = None
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class _Registry:
+    """Fallback when prometheus_client is not installed"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}   # stage -> [count, sum]
+        self.cache = {}    # (cache, result) -> count
+        self.gauges = {}   # queue -> value
+        self.local = {}    # cache -> (entries, bytes)
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def count(self, cache: str, result: str, n: int = 1):
+        with self._lock:
+            self.cache[(cache, result)] = self.cache.get((cache, result), 0) + n
+
+    def set_gauge(self, queue: str, value: float):
+        with self._lock:
+            self.gauges[queue] = value
+
+    def set_local(self, cache: str, entries: int, size_bytes: int):
+        with self._lock:
+            self.local[cache] = (entries, size_bytes)
+
+    def render(self) -> bytes:
+        with self._lock:
+            lines = [
+                "# HELP jawabai_stage_seconds Time spent per pipeline / request stage",
+                "# TYPE jawabai_stage_seconds summary"
+            ]
+            for stage, (count, total) in sorted(self.stages.items()):
+                lines.append(f'jawabai_stage_seconds_count{{stage="{stage}"}} {count}')
+                lines.append(f'jawabai_stage_seconds_sum{{stage="{stage}"}} {total}')
+            lines += [
+                "# HELP jawabai_cache_requests_total Cache lookups by cache and result",
+                "# TYPE jawabai_cache_requests_total counter"
+            ]
+            for (cache, result), count in sorted(self.cache.items()):
+                lines.append(f'jawabai_cache_requests_total{{cache="{cache}",result="{result}"}} {count}')
+            lines += [
+                "# HELP jawabai_queue_depth Items waiting per queue",
+                "# TYPE jawabai_queue_depth gauge"
+            ]
+            for queue, value in sorted(self.gauges.items()):
+                lines.append(f'jawabai_queue_depth{{queue="{queue}"}} {value}')
+            lines += [
+                "# HELP jawabai_local_cache_entries Entries per in-process cache",
+                "# TYPE jawabai_local_cache_entries gauge"
+            ]
+            for cache, (entries, _) in sorted(self.local.items()):
+                lines.append(f'jawabai_local_cache_entries{{cache="{cache}"}} {entries}')
+            lines += [
+                "# HELP jawabai_local_cache_bytes Approximate bytes per in-process cache",
+                "# TYPE jawabai_local_cache_bytes gauge"
+            ]
+            for cache, (_, size_bytes) in sorted(self.local.items()):
+                lines.append(f'jawabai_local_cache_bytes{{cache="{cache}"}} {size_bytes}')
+        return ("\n".join(lines) + "\n").encode()
+
+
+if prometheus_client is not None:
+    _STAGE_SECONDS = prometheus_client.Histogram(
+        "jawabai_stage_seconds", "Time spent per pipeline / request stage", ["stage"], buckets=STAGE_BUCKETS
+    )
+    _CACHE_REQUESTS = prometheus_client.Counter(
+        "jawabai_cache_requests", "Cache lookups by cache and result", ["cache", "result"]
+    )
+    _QUEUE_DEPTH = prometheus_client.Gauge("jawabai_queue_depth", "Items waiting per queue", ["queue"])
+    _LOCAL_ENTRIES = prometheus_client.Gauge(
+        "jawabai_local_cache_entries", "Entries per in-process cache", ["cache"]
+    )
+    _LOCAL_BYTES = prometheus_client.Gauge(
+        "jawabai_local_cache_bytes", "Approximate bytes per in-process cache", ["cache"]
+    )
+    CONTENT_TYPE = prometheus_client.CONTENT_TYPE_LATEST
+else:
+    _registry = _Registry()
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def observe(stage: str, seconds: float):
+    if prometheus_client is not None:
+        _STAGE_SECONDS.labels(stage).observe(seconds)
+    else:
+        _registry.observe(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str):
+    """Time a block as `stage` (and trace it as a span when OpenTelemetry is installed)"""
+    span = _tracer.start_as_current_span(stage) if _tracer is not None else nullcontext()
+    start = time.perf_counter()
+    with span:
+        try:
+            yield
+        finally:
+            observe(stage, time.perf_counter() - start)
+
+
+def timed_function(stage: str):
+    """Decorator form of timed() for sync and async functions"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timed(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_iter(stage: str, iterable):
+    """Time each step of an iterator (e.g. one page per step for the loader)"""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        observe(stage, time.perf_counter() - start)
+        yield item
+
+
+def record_cache(cache: str, hit: bool, count: int = 1):
+    """
+    Count `count` lookups in `cache` (query, semantic, pdf, embedding, ...)
+    "local" and "redis" count the two tiers of CacheHelper lookups
+    """
+    if not count:
+        return
+    result = "hit" if hit else "miss"
+    if prometheus_client is not None:
+        _CACHE_REQUESTS.labels(cache, result).inc(count)
+    else:
+        _registry.count(cache, result, count)
+
+
+def set_queue_depth(queue: str, value: float):
+    if prometheus_client is not None:
+        _QUEUE_DEPTH.labels(queue).set(value)
+    else:
+        _registry.set_gauge(queue, value)
+
+
+def set_local_cache_size(cache: str, entries: int, size_bytes: int):
+    if prometheus_client is not None:
+        _LOCAL_ENTRIES.labels(cache).set(entries)
+        _LOCAL_BYTES.labels(cache).set(size_bytes)
+    else:
+        _registry.set_local(cache, entries, size_bytes)
+
+
+def start_metrics_server(port: int) -> bool:
+    """Serve /metrics from a non-API process (ingestion workers); needs prometheus_client"""
+    if prometheus_client is None or not port:
+        return False
+    prometheus_client.start_http_server(port)
+    return True
+
+
+def render_metrics() -> bytes:
+    if prometheus_client is not None:
+        return prometheus_client.generate_latest()
+    return _registry.render()
@@ -0,0 +1,76 @@
+"""
+Compact serialization for cached payloads
+
+Packed format: one header byte followed by the body
+- low bits: 1 = msgpack, 2 = JSON (orjson or stdlib)
+- 0x80 bit: body is zstd-compressed
+Values written before this format (plain JSON text) are still readable.
+"""
+
+import json
+import numpy as np
+from config.settings import SERIALIZE_COMPRESS_MIN_BYTES, VECTOR_CACHE_DTYPE
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+    _compressor = zstandard.ZstdCompressor(level=3)
+    _decompressor = zstandard.ZstdDecompressor()
+except ImportError:
+    zstandard = None
+
+_MSGPACK = 0x01
+_JSON = 0x02
+_ZSTD = 0x80
+
+
+def _encode(obj) -> tuple[int, bytes]:
+    if msgpack is not None:
+        return _MSGPACK, msgpack.packb(obj, use_bin_type=True)
+    if orjson is not None:
+        return _JSON, orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return _JSON, json.dumps(obj).encode()
+
+
+def pack(obj) -> bytes:
+    fmt, body = _encode(obj)
+    if zstandard is not None and len(body) >= SERIALIZE_COMPRESS_MIN_BYTES:
+        fmt, body = fmt | _ZSTD, _compressor.compress(body)
+    return bytes([fmt]) + body
+
+
+def unpack(data):
+    if data is None:
+        return None
+    if isinstance(data, str):
+        return json.loads(data)
+    if data[:1] in (b"{", b"["):
+        # Legacy plain JSON entry
+        return json.loads(data)
+
+    fmt, body = data[0], data[1:]
+    if fmt & _ZSTD:
+        body = _decompressor.decompress(body)
+    if fmt & 0x7F == _MSGPACK:
+        return msgpack.unpackb(body, raw=False)
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+def pack_vector(vector, dtype: str = VECTOR_CACHE_DTYPE) -> bytes:
+    """Raw little-endian float32/float16 buffer"""
+    return np.asarray(vector, dtype=dtype).tobytes()
+
+
+def unpack_vector(blob: bytes, dim: int) -> np.ndarray:
+    """Buffers are self-describing by size: dim * 2 bytes = float16, dim * 4 = float32"""
+    dtype = np.float16 if len(blob) == dim * 2 else np.float32
+    return np.frombuffer(blob, dtype=dtype).astype(np.float32, copy=False)
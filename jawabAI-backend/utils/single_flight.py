@@ -0,0 +1,123 @@
+import logging
+import asyncio
+import uuid
+from storage.redis_client import async_redis_client
+from utils.metrics import record_cache
+from config.settings import COALESCE_REQUESTS, COALESCE_POLL_MS, COALESCE_MAX_POLL_MS
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical work (same upload, same question)
+
+    The first request for a key takes a Redis lease (SET NX PX) and does
+    the work; its result must end up where lookup() finds it (the PDF
+    mapping, the query cache). Requests in other processes poll lookup()
+    until the result appears, or take over if the lease ends without one
+    (the holder failed or crashed). Requests in the same process simply
+    await the first one's result.
+
+    Key: lease:{name}:{key} -> random token of the holder
+    """
+
+    def __init__(self, name: str, lease_ms: int, enabled: bool = COALESCE_REQUESTS,
+                 poll_ms: float = COALESCE_POLL_MS, max_poll_ms: float = COALESCE_MAX_POLL_MS):
+        self.name = name
+        self.lease_ms = lease_ms
+        self.enabled = enabled
+        self.poll = poll_ms / 1000
+        self.max_poll = max_poll_ms / 1000
+        self.redis = async_redis_client
+        self._inflight = {}
+
+    def lease_key(self, key: str) -> str:
+        return f"lease:{self.name}:{key}"
+
+    async def acquire(self, key: str):
+        """Take the lease; returns its token, or None while another request holds it"""
+        token = uuid.uuid4().hex
+        if not self.enabled:
+            return token
+        if await self.redis.set(self.lease_key(key), token, nx=True, px=self.lease_ms):
+            return token
+        return None
+
+    async def release(self, key: str, token: str):
+        if not self.enabled:
+            return
+        # Not atomic: if the lease expired in between and was taken by
+        # another request, that request may be duplicated - never lost
+        lease = self.lease_key(key)
+        if await self.redis.get(lease) == token:
+            await self.redis.delete(lease)
+
+    async def wait(self, key: str, lookup):
+        """Poll for the lease holder's result; None if the lease ends without one"""
+        delay = self.poll
+        while True:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_poll)
+            result = await lookup()
+            if result is not None:
+                return result
+            if not await self.redis.exists(self.lease_key(key)):
+                return None
+
+    async def do(self, key: str, work, lookup) -> tuple:
+        """
+        Run work() once per key across concurrent callers
+        Returns (result, shared) - shared is True when another request's
+        result was used.
+        """
+        if not self.enabled:
+            return await work(), False
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            try:
+                result = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The first request was cancelled (client went away) - start over
+                return await self.do(key, work, lookup)
+            record_cache(f"coalesce_{self.name}", True)
+            return result, True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result, shared = await self._lead_or_wait(key, work, lookup)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark it retrieved - there may be no one else waiting
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(result)
+        record_cache(f"coalesce_{self.name}", shared)
+        return result, shared
+
+    async def _lead_or_wait(self, key: str, work, lookup) -> tuple:
+        while True:
+            token = await self.acquire(key)
+            if token is not None:
+                try:
+                    # The previous holder may have finished just before the lease was free
+                    result = await lookup()
+                    if result is not None:
+                        return result, True
+                    return await work(), False
+                finally:
+                    await self.release(key, token)
+
+            logger.debug("⏳ Waiting on in-flight %s for %s", self.name, key)
+            result = await self.wait(key, lookup)
+            if result is not None:
+                return result, True
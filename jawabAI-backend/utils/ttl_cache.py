@@ -0,0 +1,144 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from config.settings import LOCAL_CACHE_TTL, LOCAL_CACHE_MAX_ENTRIES, LOCAL_CACHE_MAX_BYTES
+
+# Every TTLCache by name, so invalidation messages and stats reach all of them
+_caches = {}
+
+
+def adaptive_ttl(base: float, hits: int, max_ttl: float) -> float:
+    """One more base TTL per doubling of hits, capped at max_ttl"""
+    return max(base, min(max_ttl, base * (1 + hits.bit_length())))
+
+
+def sizeof(value) -> int:
+    """Approximate size of a cached value, for the byte budget"""
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    nbytes = getattr(value, "nbytes", None)
+    if nbytes is not None:
+        return int(nbytes)
+    if isinstance(value, dict):
+        return 64 + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class TTLCache:
+    """
+    Small in-process LRU cache with a per-entry TTL
+
+    Sits in front of Redis for hot keys so repeated reads within the TTL
+    skip the network entirely. Bounded by entry count and by approximate
+    size (least recently used entries go first). With max_ttl above ttl,
+    every hit pushes the entry's expiry out further (see adaptive_ttl),
+    so popular keys stay local while one-off keys expire quickly.
+    on_hit(key, hits) is called when an entry's hit count reaches a power
+    of two. Entries are only as fresh as the TTL unless a writer
+    publishes an invalidation (utils/cache_invalidation).
+    """
+
+    def __init__(self, name: str, maxsize: int = LOCAL_CACHE_MAX_ENTRIES, ttl: float = LOCAL_CACHE_TTL,
+                 max_bytes: int = LOCAL_CACHE_MAX_BYTES, max_ttl: float = None, on_hit=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_ttl = max_ttl or ttl
+        self.on_hit = on_hit
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()  # key -> [value, expires, size, hits]
+        self._lock = threading.Lock()
+        _caches[name] = self
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] < now:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            entry[3] += 1
+            hits = entry[3]
+            if self.max_ttl > self.ttl:
+                entry[1] = max(entry[1], now + adaptive_ttl(self.ttl, hits, self.max_ttl))
+            self._data.move_to_end(key)
+            self.hits += 1
+            value = entry[0]
+        if self.on_hit and hits & (hits - 1) == 0:
+            self.on_hit(key, hits)
+        return value
+
+    def set(self, key, value, ttl: float = None, size: int = None):
+        size = sizeof(value) if size is None else size
+        if size > self.max_bytes:
+            self.delete(key)
+            return
+        with self._lock:
+            # Rewriting a key (e.g. a refreshed answer) keeps its popularity
+            old = self._remove(key)
+            self._data[key] = [value, time.monotonic() + (ttl or self.ttl), size, old[3] if old else 0]
+            self.bytes += size
+            while len(self._data) > self.maxsize or self.bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.bytes -= evicted[2]
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+        return entry
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def delete_prefix(self, prefix: str):
+        with self._lock:
+            for key in [k for k in self._data if isinstance(k, str) and k.startswith(prefix)]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions
+            }
+
+
+def invalidate_local(keys=(), prefixes=()):
+    """Drop keys (and keys under prefixes) from every in-process cache"""
+    for cache in list(_caches.values()):
+        for key in keys:
+            cache.delete(key)
+        for prefix in prefixes:
+            cache.delete_prefix(prefix)
+
+
+def clear_local():
+    for cache in list(_caches.values()):
+        cache.clear()
+
+
+def local_cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in _caches.items()}
@@ -0,0 +1,53 @@
+"""
+Startup warmup - load the models/clients a process will use and run one
+dummy call through each, so the first real request does not pay for it
+
+The API warms what chat needs (embedding model, reranker, vector store
+client, Gemini client) plus the chunker tokenizer when it runs ingestion itself;
+workers warm only the ingestion side.
+"""
+
+import logging
+import time
+from config.settings import VECTOR_STORE
+
+logger = logging.getLogger(__name__)
+
+_state = {"done": False, "seconds": None}
+
+
+def _steps(for_chat: bool, for_ingest: bool) -> list:
+    from processing.embedder import embed
+
+    steps = [("embedding_model", lambda: embed(["warmup"]))]
+    if for_ingest:
+        from processing.chunker import token_length
+        steps.append(("tokenizer", lambda: token_length("warmup")))
+    if for_chat:
+        from retrieval.reranker import reranker
+        if reranker:
+            steps.append(("reranker", lambda: reranker.rerank("warmup", [{"text": "warmup", "score": 0.0}])))
+        if VECTOR_STORE == "pinecone":
+            from retrieval.pinecone_client import index
+            steps.append(("pinecone", index.get))
+        # Client only - a dummy generation would cost a real LLM call
+        from llm.generator import model
+        steps.append(("gemini", model.get))
+    return steps
+
+
+def run_warmup(for_chat: bool = True, for_ingest: bool = True):
+    """Blocking - the API runs it in a worker thread. A failed step is logged, not raised."""
+    start = time.perf_counter()
+    for name, step in _steps(for_chat, for_ingest):
+        try:
+            step()
+        except Exception as e:
+            logger.warning("⚠️ Warmup of %s failed: %s", name, e)
+    _state["done"] = True
+    _state["seconds"] = round(time.perf_counter() - start, 3)
+    logger.info("🔥 Warmup finished in %.1fs", _state["seconds"])
+
+
+def warmup_status() -> dict:
+    return dict(_state)
@@ -0,0 +1,112 @@
+"""
+Ingestion worker - pulls jobs from the Redis ingest queue and runs the pipeline
+
+Run alongside the API with INGEST_MODE=queue:
+    python worker.py
+
+Scale with INGEST_WORKER_PROCESSES (processes per host) and
+INGEST_WORKER_CONCURRENCY (documents in flight per process), or run more
+hosts - every worker pulls from the same Redis queue. Jobs held by a
+worker that stops heartbeating are re-queued by the others.
+"""
+
+import logging
+import multiprocessing
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.metrics import start_metrics_server
+from config.settings import (
+    INGEST_WORKER_PROCESSES, INGEST_WORKER_CONCURRENCY, INGEST_MAX_RETRIES, LOG_LEVEL, LOG_FORMAT,
+    WORKER_METRICS_PORT, WARMUP_ON_STARTUP, INGEST_WORKER_ID, INGEST_WORKER_HEARTBEAT_TTL
+)
+
+logger = logging.getLogger(__name__)
+
+
+def run_worker(index: int):
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+    # Import inside the child so each process loads its own model/clients
+    from ingestion.pipeline import ingest_pipeline
+    from ingestion.job_queue import (
+        next_job, ack_job, retry_job, promote_delayed_jobs, requeue_orphaned_jobs, heartbeat
+    )
+    from utils.warmup import run_warmup
+
+    worker_name = f"{INGEST_WORKER_ID or socket.gethostname()}:{index}"
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    if start_metrics_server(WORKER_METRICS_PORT + index if WORKER_METRICS_PORT else 0):
+        logger.info("📈 Worker metrics on port %d", WORKER_METRICS_PORT + index)
+
+    # Load the model before taking jobs, so the first job is not slowed down
+    if WARMUP_ON_STARTUP:
+        run_warmup(for_chat=False, for_ingest=True)
+
+    slots = threading.BoundedSemaphore(INGEST_WORKER_CONCURRENCY)
+    heartbeat(worker_name)
+    requeue_orphaned_jobs(worker_name)
+
+    # In its own thread, so in-flight jobs stay claimed while a shutdown waits for them
+    def beat():
+        while True:
+            time.sleep(INGEST_WORKER_HEARTBEAT_TTL / 3)
+            try:
+                heartbeat(worker_name)
+            except Exception as e:
+                logger.warning("⚠️ Heartbeat failed for worker %s: %s", worker_name, e)
+
+    threading.Thread(target=beat, daemon=True).start()
+    last_scan = time.monotonic()
+    logger.info("👷 Worker %s started (concurrency=%d)", worker_name, INGEST_WORKER_CONCURRENCY)
+
+    def run_job(raw, job):
+        try:
+            ingest_pipeline(
+                job["source"],
+                job["use_case"],
+                job["document_id"],
+                job.get("filename"),
+                file_hash=job.get("file_hash"),
+                # Keep the spooled file around while retries remain
+                cleanup_on_failure=job["attempts"] >= INGEST_MAX_RETRIES
+            )
+            ack_job(worker_name, raw)
+        except Exception as e:
+            logger.warning("⚠️ Job for document ID '%s' failed: %s", job["document_id"], e)
+            retry_job(worker_name, raw, job)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=INGEST_WORKER_CONCURRENCY) as pool:
+        while not stop.is_set():
+            promote_delayed_jobs()
+            if time.monotonic() - last_scan >= INGEST_WORKER_HEARTBEAT_TTL:
+                requeue_orphaned_jobs()
+                last_scan = time.monotonic()
+
+            # Only pull a job when there is a free slot to run it
+            if not slots.acquire(timeout=1):
+                continue
+            raw, job = next_job(worker_name, timeout=1)
+            if job is None:
+                slots.release()
+                continue
+            pool.submit(run_job, raw, job)
+
+    logger.info("👋 Worker %s stopped", worker_name)
+
+
+if __name__ == "__main__":
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(i,))
+        for i in range(INGEST_WORKER_PROCESSES)
+    ]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()